@@ -0,0 +1,7 @@
+import os
+
+# The cache folder shared by UFOUpload and UFODownload: $UFOMANAGER_CACHE if set, otherwise
+# UFOManager under the XDG cache folder (~/.cache by default).
+
+cache_path = os.environ.get('UFOMANAGER_CACHE',
+                            os.path.join(os.environ.get('XDG_CACHE_HOME', os.path.join(os.path.expanduser('~'), '.cache')), 'UFOManager'))
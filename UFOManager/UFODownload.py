@@ -6,13 +6,25 @@ from github import Github
 import os
 import requests
 import shutil
+import tarfile
+import hashlib
+import time
+import subprocess
+import threading
+from urllib.parse import urlparse
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import json
-import zenodo_get
+import re
+import sqlite3
+from urllib.request import pathname2url
 from getpass import getpass
 import argparse
 from tabulate import tabulate
 from termcolor import colored
-from particle import PDGID
+from UFOManager.UFOPDG import is_sm_elementary
+from UFOManager.UFOGitHub import metadata_repo, raw_repo_url, metadata_tree
+from UFOManager.UFOCache import cache_path
+from UFOManager import UFOHTTP
 # This python script utilizes zenodo_get package from David Volgyes
 # David Volgyes. (2020, February 20). Zenodo_get: a downloader for Zenodo records (Version 1.3.4).
 # Zenodo. https://doi.org/10.5281/zenodo.1261812
@@ -28,43 +40,313 @@ url     = {https://doi.org/10.5281/zenodo.1261812}
 }'''
 
 
-def AccessGitRepo(Github_Access_Token):
-    # Connect to Github Repository
+# Local metadata cache, kept between runs and synced against the git blob SHAs of UFOMetadata
+metadata_folder = os.path.join(cache_path, 'Metadata')
+manifest_file = os.path.join(cache_path, 'manifest.json')
+# Above this many changed files one archive download is cheaper than fetching files one by one
+bulk_threshold = 20
+# The synced metadata compiled into one SQLite database that Search, Display and Query read
+catalog_file = os.path.join(cache_path, 'catalog.sqlite')
+# Bump when the catalog schema changes, the catalog is then rebuilt
+catalog_version = 1
+# Version DOI -> concept DOI, resolved through the Zenodo records API and refreshed after concept_doi_ttl seconds
+concept_doi_file = os.path.join(cache_path, 'concept_dois.json')
+concept_doi_ttl = 30 * 24 * 3600
+# DOIs looked up with one Zenodo records search
+concept_doi_batch = 50
+zenodo_records_url = 'https://zenodo.org/api/records/'
+request_timeout = 30
+# Number of Zenodo records downloaded at the same time, and open connections allowed per host
+download_workers = 4
+host_connections = {'zenodo.org': 4}
+default_host_connections = 2
+# Streaming downloads: bytes per chunk, retries of a dropped transfer and seconds between them
+chunk_size = 1 << 20
+download_retries = 5
+retry_pause = 2
+# Downloaded model files, stored once under their checksum and linked into download folders
+store_folder = os.path.join(cache_path, 'store')
 
-    g = Github(Github_Access_Token)
-    repo = g.get_repo("Neubauer-Group/UFOMetadata")
-    Allmetadata = repo.get_contents('Metadata')
 
-    # Create a temporary folder for metadata
+def load_manifest():
+    # Mapping of metadata file name to the git blob SHA of the cached copy
     try:
-        os.mkdir('MetadatafilesTemporaryFolder')
-    except FileExistsError:
-        os.chdir('MetadatafilesTemporaryFolder')
-        return
-
-    os.chdir('MetadatafilesTemporaryFolder')
-
-    # Download all metadata files from GitHub Repository
-    for i in Allmetadata:
-        name = i.name
-        url = 'https://raw.githubusercontent.com/Neubauer-Group/UFOMetadata/main/Metadata/'
-        url += name
-        metadata = requests.get(url)
-        open(name,'wb').write(metadata.content)
-
-def Display(jsonlist):
-    display_data = []    
-    for file in jsonlist:
-        with open(file,encoding='utf-8') as metadata:
-            metadatafile = json.load(metadata)
-        if 'arXiv' in metadatafile['Paper_id']:
-            information = [file,metadatafile['Model name'],metadatafile['Paper_id']['arXiv'],metadatafile['Model Doi']] #metadatafile['Description']]
+        with open(manifest_file, encoding='utf-8') as manifest:
+            return json.load(manifest)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+def save_manifest(manifest):
+    tmp = manifest_file + '.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp, manifest_file)
+
+
+def write_metadata(name, content):
+    # Write through a temporary file so an interrupted sync never leaves a truncated metadata file
+    tmp = os.path.join(cache_path, name + '.tmp')
+    with open(tmp, 'wb') as f:
+        f.write(content)
+    os.replace(tmp, os.path.join(metadata_folder, name))
+
+
+def git_blob_sha(content):
+    # Same SHA git reports for the blob, so archive contents and tree listings share one manifest
+    return hashlib.sha1(b'blob %d\0' % len(content) + content).hexdigest()
+
+
+def remove_metadata(manifest, names):
+    for name in names:
+        try:
+            os.remove(os.path.join(metadata_folder, name))
+        except FileNotFoundError:
+            pass
+        manifest.pop(name, None)
+
+
+def bulk_sync(Github_Access_Token, manifest):
+    # Fetch the whole repository as one tarball and stream the Metadata/*.json members into the cache
+    headers = {'Authorization': 'token ' + Github_Access_Token} if Github_Access_Token else {}
+    r = UFOHTTP.get('https://api.github.com/repos/{}/tarball/main'.format(metadata_repo),
+                     headers=headers, stream=True, max_quota_wait=60)
+    if r.status_code >= 400:
+        raise Exception(colored('Downloading UFOMetadata archive failed!', 'red') + ' Status Code: {}'.format(r.status_code))
+    r.raw.decode_content = True
+
+    remote = {}
+    with tarfile.open(fileobj=r.raw, mode='r|gz') as archive:
+        for member in archive:
+            # Members are named <repo>-<commit>/Metadata/[<shard>/]<file>
+            parts = member.name.split('/')
+            if not member.isfile() or len(parts) < 3 or parts[1] != 'Metadata' or not parts[-1].endswith('.json'):
+                continue
+            name = parts[-1]
+            content = archive.extractfile(member).read()
+            remote[name] = git_blob_sha(content)
+            if manifest.get(name) != remote[name]:
+                write_metadata(name, content)
+                manifest[name] = remote[name]
+
+    remove_metadata(manifest, [i for i in manifest if i not in remote])
+
+
+def incremental_sync(stale, manifest, paths):
+    # Download the given new or changed files one by one over a single connection
+    for name, sha in stale.items():
+        metadata = UFOHTTP.get(raw_repo_url + paths[name])
+        if metadata.status_code >= 400:
+            print(colored('Could not download metadata file {}, keeping the cached copy.'.format(name), 'yellow'))
+            continue
+        write_metadata(name, metadata.content)
+        manifest[name] = sha
+
+
+def stale_metadata(remote, manifest):
+    return {name: sha for name, sha in remote.items()
+            if manifest.get(name) != sha or not os.path.isfile(os.path.join(metadata_folder, name))}
+
+
+def AccessGitRepo(Github_Access_Token, bulk=None):
+    # Sync the local metadata cache with the GitHub Repository and move into it.
+    # bulk=True always fetches the repository archive, bulk=False always fetches file by file,
+    # and by default the archive is used on a cold cache or when many files changed.
+    os.makedirs(metadata_folder, exist_ok=True)
+    manifest = load_manifest()
+
+    try:
+        if bulk or (bulk is None and not manifest):
+            bulk_sync(Github_Access_Token, manifest)
         else:
-            if 'doi.org' in metadatafile['Paper_id']['doi']:
-                information = [file,metadatafile['Model name'],metadatafile['Paper_id']['doi'][16:],metadatafile['Model Doi']] #,metadatafile['Description']]
+            g = Github(Github_Access_Token)
+            repo = g.get_repo(metadata_repo)
+            Allmetadata = metadata_tree(repo)
+            paths = {os.path.basename(i): i for i in Allmetadata}
+            remote = {os.path.basename(i): sha for i, sha in Allmetadata.items()}
+            stale = stale_metadata(remote, manifest)
+            if bulk is None and len(stale) > bulk_threshold:
+                bulk_sync(Github_Access_Token, manifest)
             else:
-                information = [file,metadatafile['Model name'],metadatafile['Paper_id']['doi'],metadatafile['Model Doi']] #,metadatafile['Description']]
-        display_data.append(information)
+                remove_metadata(manifest, [i for i in manifest if i not in remote])
+                incremental_sync(stale, manifest, paths)
+    except Exception:
+        if not manifest:
+            raise Exception(colored('Cannot reach UFOMetadata and no local metadata cache exists.', 'red'))
+        print(colored('Cannot reach UFOMetadata, searching the local metadata snapshot instead.', 'yellow'))
+    finally:
+        save_manifest(manifest)
+
+    update_catalog(manifest)
+    os.chdir(metadata_folder)
+
+catalog_schema = [
+    'CREATE TABLE models (file TEXT PRIMARY KEY, sha TEXT, model_name TEXT, paper TEXT, model_doi TEXT, concept_doi TEXT, nlo INTEGER)',
+    'CREATE TABLE particles (file TEXT, name TEXT, pdg_code INTEGER)',
+    'CREATE TABLE papers (file TEXT, paper_id TEXT)',
+    'CREATE TABLE dois (file TEXT, doi TEXT)',
+    'CREATE INDEX particles_name ON particles (name, file)',
+    'CREATE INDEX particles_pdg_code ON particles (pdg_code, file)',
+    'CREATE INDEX particles_file ON particles (file)',
+    'CREATE INDEX papers_paper_id ON papers (paper_id, file)',
+    'CREATE INDEX papers_file ON papers (file)',
+    'CREATE INDEX dois_doi ON dois (doi, file)',
+    'CREATE INDEX dois_file ON dois (file)',
+]
+
+
+def catalog_insert(db, name, sha):
+    # Add the rows of one cached metadata file to the catalog
+    with open(os.path.join(metadata_folder, name), encoding='utf-8') as metadata:
+        metadatafile = json.load(metadata)
+    if 'arXiv' in metadatafile['Paper_id']:
+        paper = metadatafile['Paper_id']['arXiv']
+    elif 'doi.org' in metadatafile['Paper_id']['doi']:
+        paper = metadatafile['Paper_id']['doi'][16:]
+    else:
+        paper = metadatafile['Paper_id']['doi']
+    concept_doi = metadatafile.get('Existing Model Doi')
+    db.execute('INSERT INTO models VALUES (?, ?, ?, ?, ?, ?, ?)',
+               (name, sha, metadatafile.get('Model name', ''), paper, metadatafile['Model Doi'], concept_doi,
+                int(bool(metadatafile.get('Allows NLO calculations', False)))))
+    db.executemany('INSERT INTO particles VALUES (?, ?, ?)',
+                   [(name, particle_name, pdg_code) for particle_name, pdg_code in metadatafile['All Particles'].items()])
+    db.executemany('INSERT INTO papers VALUES (?, ?)', [(name, i) for i in metadatafile['Paper_id'].values()])
+    db.executemany('INSERT INTO dois VALUES (?, ?)', [(name, i) for i in [metadatafile['Model Doi'], concept_doi] if i])
+
+
+def update_catalog(manifest=None):
+    # Bring the catalog in line with the metadata cache, re-reading only files whose SHA changed.
+    # The default rollback journal is kept (no WAL) so the database works on shared cluster filesystems.
+    manifest = load_manifest() if manifest is None else manifest
+    db = sqlite3.connect(catalog_file, timeout=60, isolation_level=None)
+    try:
+        db.execute('BEGIN IMMEDIATE')
+        if db.execute('PRAGMA user_version').fetchone()[0] != catalog_version:
+            for table in ['models', 'particles', 'papers', 'dois']:
+                db.execute('DROP TABLE IF EXISTS ' + table)
+            for statement in catalog_schema:
+                db.execute(statement)
+            db.execute('PRAGMA user_version = {}'.format(catalog_version))
+        known = dict(db.execute('SELECT file, sha FROM models'))
+        changed = [name for name, sha in manifest.items() if known.get(name) != sha]
+        for name in [i for i in known if i not in manifest] + changed:
+            for table in ['models', 'particles', 'papers', 'dois']:
+                db.execute('DELETE FROM {} WHERE file = ?'.format(table), (name,))
+        for name in changed:
+            catalog_insert(db, name, manifest[name])
+        db.execute('COMMIT')
+    except BaseException:
+        db.execute('ROLLBACK')
+        raise
+    finally:
+        db.close()
+
+
+def open_catalog():
+    # Read-only connection to the catalog, safe to hold from many processes at once.
+    # The catalog is brought up to date first when it lags behind the metadata cache.
+    manifest = load_manifest()
+    if not manifest:
+        raise Exception(colored('No local metadata cache exists, sync it first with AccessGitRepo (or the "query" command without --offline).', 'red'))
+    uri = 'file:{}?mode=ro'.format(pathname2url(catalog_file))
+    try:
+        catalog = sqlite3.connect(uri, uri=True, timeout=60)
+        if catalog.execute('PRAGMA user_version').fetchone()[0] == catalog_version and \
+                dict(catalog.execute('SELECT file, sha FROM models')) == manifest:
+            return catalog
+        catalog.close()
+    except sqlite3.Error:
+        pass
+    update_catalog(manifest)
+    return sqlite3.connect(uri, uri=True, timeout=60)
+
+
+def models_with_all(catalog, table, column, values):
+    # Models that have every one of values in the given column
+    values = list(set(values))
+    rows = catalog.execute('SELECT file FROM {0} WHERE {1} IN ({2}) GROUP BY file HAVING COUNT(DISTINCT {1}) = ?'.format(
+        table, column, ', '.join('?' * len(values))), values + [len(values)])
+    return set(i[0] for i in rows)
+
+
+def models_with_doi(catalog, dois):
+    # Models whose model DOI or concept DOI is one of dois
+    rows = catalog.execute('SELECT file FROM dois WHERE doi IN ({})'.format(', '.join('?' * len(dois))), list(dois))
+    return set(i[0] for i in rows)
+
+
+def zenodo_record_id(doi):
+    # '10.5281/zenodo.1234' and 'https://doi.org/10.5281/zenodo.1234' both give '1234'
+    doi = doi.strip()
+    if 'zenodo.' not in doi:
+        return None
+    record_id = doi.split('zenodo.')[-1]
+    return record_id if record_id.isdigit() else None
+
+
+def fetch_concept_dois(dois):
+    # Concept DOIs of a batch of Zenodo DOIs, found with one records search instead of a request per record.
+    # Records the search does not return (not indexed yet) are missing from the answer.
+    record_ids = {}
+    for doi in dois:
+        record_ids.setdefault(zenodo_record_id(doi), []).append(doi)
+    query = 'doi:({})'.format(' OR '.join('"10.5281/zenodo.{}"'.format(i) for i in sorted(record_ids)))
+    r = UFOHTTP.get(zenodo_records_url, params={'q': query, 'size': len(record_ids), 'all_versions': 'true'},
+                    timeout=request_timeout)
+    if r.status_code >= 400:
+        raise Exception('Zenodo records search returned status code {}'.format(r.status_code))
+    found = {}
+    for hit in r.json()['hits']['hits']:
+        for doi in record_ids.get(str(hit['id']), []):
+            found[doi] = hit.get('conceptdoi')
+    return found
+
+
+def resolve_concept_dois(dois, workers=8, ttl=None):
+    # Map each version DOI to its concept DOI. Known answers come from the persisted map,
+    # missing or expired ones are looked up on Zenodo in batches of concept_doi_batch and written back.
+    ttl = concept_doi_ttl if ttl is None else ttl
+    try:
+        with open(concept_doi_file, encoding='utf-8') as f:
+            known = json.load(f)
+    except (FileNotFoundError, ValueError):
+        known = {}
+
+    now = time.time()
+    missing = sorted(set(doi for doi in dois if doi not in known or now - known[doi]['checked'] > ttl))
+    if missing:
+        # Not a Zenodo DOI, so there is no concept DOI to find
+        for doi in [i for i in missing if zenodo_record_id(i) is None]:
+            known[doi] = {'concept_doi': None, 'checked': now}
+        missing = [i for i in missing if zenodo_record_id(i) is not None]
+        batches = [missing[i:i + concept_doi_batch] for i in range(0, len(missing), concept_doi_batch)]
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = [(batch, pool.submit(fetch_concept_dois, batch)) for batch in batches]
+        for batch, future in futures:
+            try:
+                found = future.result()
+            except Exception as e:
+                # Keep a stale answer over none at all, and retry on the next query
+                print(colored('Could not resolve the concept DOIs of {}: {}'.format(', '.join(batch), e), 'yellow'))
+                continue
+            for doi in batch:
+                if doi in found:
+                    known[doi] = {'concept_doi': found[doi], 'checked': now}
+                else:
+                    print(colored('Zenodo has no record for {}'.format(doi), 'yellow'))
+        tmp = concept_doi_file + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(known, f, indent=2, sort_keys=True)
+        os.replace(tmp, concept_doi_file)
+
+    return {doi: known[doi]['concept_doi'] for doi in dois if doi in known}
+
+
+def Display(jsonlist, catalog=None):
+    catalog = open_catalog() if catalog is None else catalog
+    models = dict((i[0], list(i)) for i in catalog.execute('SELECT file, model_name, paper, model_doi FROM models'))
+    display_data = [models[file] for file in jsonlist if file in models]
     
     print(tabulate(display_data, headers=["Metadata file","Model Name","Paper ID","Model DOI"]))
         
@@ -79,6 +361,7 @@ def Search(Github_Access_Token):
                                                                                                                 colored('name', 'magenta'))
     )
     all_json_file = set()
+    catalog = open_catalog()
     
     # Now allows multiple times search
     while True:
@@ -90,64 +373,34 @@ def Search(Github_Access_Token):
         if search_type == 'Paper_id':
             paper_id = input('Please enter your needed paper_id: ')
             
-            target_list = []
-            for file in os.listdir('.'):
-                with open(file,encoding='utf-8') as metadata:
-                    metadatafile = json.load(metadata)
-                paper_ids = [metadatafile['Paper_id'][i] for i in metadatafile['Paper_id']]
-                if paper_id in paper_ids:
-                    target_list.append(file)
+            target_list = sorted(models_with_all(catalog, 'papers', 'paper_id', [paper_id]))
             
             if len(target_list) == 0:
                 print('There is no model associated with the paper_id ' + colored(paper_id,'red') + ' you are looking for.')
             else:
                 print('Based on your search, we find models below:')
-                Display(jsonlist=target_list)
+                Display(jsonlist=target_list, catalog=catalog)
                 all_json_file = all_json_file.union(target_list)
         
         # Search for models with corresponding model Doi from Zenodo
         if search_type == 'Model Doi':
             Model_Doi = input('Please enter your needed Model doi: ')
 
-            model_name = ''
-            target_list = []
-            current_working_doi = ''
-            for file in os.listdir('.'):
-                with open(file,encoding='utf-8') as metadata:
-                    metadatafile = json.load(metadata)
-                if Model_Doi == metadatafile['Model Doi']:
-                    model_name = file
-                    break
-                if 'Existing Model Doi' in metadatafile and metadatafile['Existing Model Doi'] == Model_Doi:
-                    model_name = file
-                    break
-            if len(model_name) != 0:
-                target_list.append(model_name)
-                with open(model_name,encoding='utf-8') as metadata:
-                    _metadatafile = json.load(metadata)
-                if 'Existing Model Doi' in _metadatafile:
-                    current_working_doi = _metadatafile['Existing Model Doi']
-                    for file in os.listdir('.'):
-                        if file in target_list:
-                            continue
-                        with open(file,encoding='utf-8') as metadata:
-                            metadatafile = json.load(metadata)
-                        if 'Existing Model Doi' in metadatafile:
-                            if metadatafile['Existing Model Doi'] == current_working_doi:
-                                target_list.append(file)
-                            continue
-                        this_doi = metadatafile['Model Doi']
-                        r = requests.get("https://doi.org/" + this_doi)
-                        for line in r.iter_lines():
-                            line = str(line)
-                            if 'Cite all versions' not in line:
-                                continue
-                            conceptdoi = line.split("https://doi.org")[1].split('</a>')[0].split('">')[1]
-                            break
-                        if current_working_doi == conceptdoi:
+            matches = sorted(models_with_doi(catalog, [Model_Doi]))
+            if len(matches) != 0:
+                model_name = matches[0]
+                target_list = [model_name]
+                # Versions either record their concept DOI or have it resolved through Zenodo
+                models = catalog.execute('SELECT file, model_doi, concept_doi FROM models').fetchall()
+                concept_dois = resolve_concept_dois([doi for file, doi, concept_doi in models if not concept_doi])
+                lineage = {file: concept_doi or concept_dois.get(doi) for file, doi, concept_doi in models}
+                current_working_doi = lineage[model_name]
+                if current_working_doi:
+                    for file in sorted(lineage):
+                        if file not in target_list and lineage[file] == current_working_doi:
                             target_list.append(file)
                 print('Based on your search, we find models below:')                                                        
-                Display(jsonlist=target_list)
+                Display(jsonlist=target_list, catalog=catalog)
                 all_json_file = all_json_file.union(target_list)
             else:
                 print('There is no model associated with the Model Doi ' + colored(Model_Doi,'red') + ' you are looking for.') 
@@ -158,30 +411,22 @@ def Search(Github_Access_Token):
         if search_type == 'pdg code':
             pdg_code = [f.strip() for f in input('Please enter your needed pdg code: ').split(',')]
             pdg_code_list = [int(i) for i in pdg_code]
-            target_list = []
             elementary_particles_list = []
             for i in pdg_code_list:
-                if PDGID(i).is_sm_quark == True or PDGID(i).is_sm_gauge_boson_or_higgs == True or PDGID(i).is_sm_lepton == True:
+                if is_sm_elementary(i):
                     elementary_particles_list.append(i)
             elementary_particle_compare = all(i in elementary_particles_list for i in pdg_code_list)
             Feedback = 'All particles you are looking for are elementary particles which are contained by all models. Please try again with BSM particles.'
             if elementary_particle_compare:
                 print(colored(Feedback,'red'))
             else:
-                for file in os.listdir('.'):
-                    with open(file,encoding='utf-8') as metadata:
-                        metadatafile = json.load(metadata)
-                    All_particles_pdg_code = [metadatafile['All Particles'][i] for i in metadatafile['All Particles']]
-                    pdg_dict = {}
-                    pdg_code_compare_result = all(i in All_particles_pdg_code for i in pdg_code_list)
-                    if pdg_code_compare_result:
-                        target_list.append(file)
+                target_list = sorted(models_with_all(catalog, 'particles', 'pdg_code', pdg_code_list))
                     
                 if len(target_list) == 0:
                     print('There is no model containing all particle(s) with pdg code' + colored(pdg_code,'red') + ' you are looking for.')
                 else:
                     print('Based on your search, we find models below:')
-                    Display(jsonlist=target_list)
+                    Display(jsonlist=target_list, catalog=catalog)
                     all_json_file = all_json_file.union(target_list)
                     
         
@@ -191,38 +436,28 @@ def Search(Github_Access_Token):
             pdg_code_corresponding_list = []
             target_list = []
 
-            for file in os.listdir('.'):
-                with open(file,encoding='utf-8') as metadata:
-                    metadatafile = json.load(metadata)
-                All_particles_name_list = [i for i in metadatafile['All Particles']]
-                particle_compare_result = all(i in All_particles_name_list for i in particle_name_list)
-                if particle_compare_result:
-                    pdg_code_corresponding_list = [metadatafile['All Particles'][i] for i in particle_name_list]
-                    break
+            # Particle names are translated to pdg codes with the first model defining all of them
+            named_models = sorted(models_with_all(catalog, 'particles', 'name', particle_name_list))
+            if named_models:
+                pdg_codes = dict(catalog.execute('SELECT name, pdg_code FROM particles WHERE file = ?', (named_models[0],)))
+                pdg_code_corresponding_list = [pdg_codes[i] for i in particle_name_list]
             if pdg_code_corresponding_list != []:
                 elementary_particles_list = []
                 for i in pdg_code_corresponding_list:
-                    if PDGID(i).is_sm_quark == True or PDGID(i).is_sm_gauge_boson_or_higgs == True or PDGID(i).is_sm_lepton == True:
+                    if is_sm_elementary(i):
                         elementary_particles_list.append(i)
                 elementary_particle_compare = all(i in elementary_particles_list for i in pdg_code_corresponding_list)
                 Feedback = 'All particles you are looking for are elementary particles which are contained by all models. Please try again with BSM particles.'
                 if elementary_particle_compare:
                     print(colored(Feedback,'red'))
                 else:
-                    for file in os.listdir('.'):
-                        with open(file,encoding='utf-8') as metadata:
-                            metadatafile = json.load(metadata)
-                        All_particles_pdg_code = [metadatafile['All Particles'][i] for i in metadatafile['All Particles']]
-                        pdg_dict_from_particles = {}
-                        pdg_code_compare_result_from_particles = all(i in All_particles_pdg_code for i in pdg_code_corresponding_list)
-                        if pdg_code_compare_result_from_particles:
-                            target_list.append(file)
+                    target_list = sorted(models_with_all(catalog, 'particles', 'pdg_code', pdg_code_corresponding_list))
             else:
                 print('There is no model containing all particle(s) ' + colored(particle_name_list,'red') + ' you are looking for.')
 
             if len(target_list) != 0:
                 print('Based on your search, we find models below:')
-                Display(jsonlist=target_list)
+                Display(jsonlist=target_list, catalog=catalog)
                 all_json_file = all_json_file.union(target_list)
                                 
 
@@ -234,11 +469,300 @@ def Search(Github_Access_Token):
 
 
 
+# Non-interactive search. A query combines field:value terms with and, or, not and parentheses,
+# adjacent terms are joined with and, and a comma separated value must match all of its items:
+#     pdg:9000005,9000006 and (paper:2201.00001 or name:Zp) and not nlo:true
+# doi is the exception, a model has a single model DOI (and concept DOI), so doi:a,b matches
+# models with either one. Values with spaces or parentheses are quoted: paper:"10.1016/S0370-2693(02)01234-5"
+query_fields = ['pdg', 'name', 'paper', 'doi', 'nlo']
+query_token = re.compile(r'\s*(\(|\)|[A-Za-z_]+:"[^"]*"|[^\s()]+)')
+
+
+def query_term(catalog, term):
+    field, _, value = term.partition(':')
+    field = field.lower()
+    value = value.strip('"')
+    if field not in query_fields or not value:
+        raise Exception('Invalid query term "{}", use one of {} as field:value'.format(term, ', '.join(query_fields)))
+    values = [i.strip() for i in value.split(',')]
+    if field == 'pdg':
+        try:
+            return models_with_all(catalog, 'particles', 'pdg_code', [int(i) for i in values])
+        except ValueError:
+            raise Exception('Invalid pdg code in "{}"'.format(term))
+    if field == 'name':
+        return models_with_all(catalog, 'particles', 'name', values)
+    if field == 'paper':
+        return models_with_all(catalog, 'papers', 'paper_id', values)
+    if field == 'doi':
+        return models_with_doi(catalog, values)
+    if value.lower() not in ['true', 'false']:
+        raise Exception('nlo takes true or false, not "{}"'.format(value))
+    return set(i[0] for i in catalog.execute('SELECT file FROM models WHERE nlo = ?', (int(value.lower() == 'true'),)))
+
+
+def Query(expression, catalog=None):
+    # Metadata files matching a query expression, pass catalog to reuse an open catalog across queries.
+    # The metadata cache has to be synced with AccessGitRepo first.
+    catalog = open_catalog() if catalog is None else catalog
+    tokens = query_token.findall(expression)
+    if not tokens:
+        raise Exception('Empty query')
+    position = [0]
+
+    def peek():
+        return tokens[position[0]].lower() if position[0] < len(tokens) else None
+
+    def take():
+        position[0] += 1
+        return tokens[position[0] - 1]
+
+    def parse_or():
+        result = parse_and()
+        while peek() == 'or':
+            take()
+            result = result | parse_and()
+        return result
+
+    def parse_and():
+        result = parse_not()
+        while peek() not in [None, 'or', ')']:
+            if peek() == 'and':
+                take()
+            result = result & parse_not()
+        return result
+
+    def parse_not():
+        if peek() == 'not':
+            take()
+            return set(i[0] for i in catalog.execute('SELECT file FROM models')) - parse_not()
+        if peek() == '(':
+            take()
+            result = parse_or()
+            if peek() != ')':
+                raise Exception('Missing ")" in query "{}"'.format(expression))
+            take()
+            return result
+        if peek() in [None, ')', 'and', 'or']:
+            raise Exception('Incomplete query "{}"'.format(expression))
+        return query_term(catalog, take())
+
+    result = parse_or()
+    if position[0] != len(tokens):
+        raise Exception('Unexpected "{}" in query "{}"'.format(tokens[position[0]], expression))
+    return sorted(result)
+
+
+def Query_Records(expression, catalog=None):
+    # Query results with the fields Display shows, ready to be written out as JSON
+    catalog = open_catalog() if catalog is None else catalog
+    records = []
+    for name in Query(expression, catalog):
+        model_name, model_doi, nlo = catalog.execute('SELECT model_name, model_doi, nlo FROM models WHERE file = ?', (name,)).fetchone()
+        records.append({'Metadata file': name,
+                        'Model Name': model_name,
+                        'Paper ID': [i[0] for i in catalog.execute('SELECT paper_id FROM papers WHERE file = ?', (name,))],
+                        'Model DOI': model_doi,
+                        'Allows NLO calculations': bool(nlo)})
+    return records
+
+
+def Query_Stream(queries, output=sys.stdout):
+    # Run many queries against one loaded catalog, writing one JSON line per query
+    catalog = open_catalog()
+    for expression in queries:
+        expression = expression.strip()
+        if not expression or expression.startswith('#'):
+            continue
+        try:
+            line = {'query': expression, 'models': Query_Records(expression, catalog)}
+        except Exception as e:
+            line = {'query': expression, 'error': str(e)}
+        output.write(json.dumps(line) + '\n')
+        output.flush()
+
+
+def record_files(doi):
+    # List the files of a Zenodo record with their size, checksum and download link
+    record_id = zenodo_record_id(doi)
+    if record_id is None:
+        # Follow the DOI to its landing page, which for Zenodo ends with the record id
+        r = UFOHTTP.head('https://doi.org/' + doi, allow_redirects=True, timeout=request_timeout)
+        record_id = urlparse(r.url).path.rstrip('/').split('/')[-1]
+        if not record_id.isdigit():
+            raise Exception('{} does not resolve to a Zenodo record'.format(doi))
+    r = UFOHTTP.get(zenodo_records_url + record_id, timeout=request_timeout)
+    if r.status_code >= 400:
+        raise Exception('Zenodo record {} returned status code {}'.format(record_id, r.status_code))
+    return [{'key': i['key'], 'size': i['size'], 'checksum': i['checksum'], 'url': i['links']['self']}
+            for i in r.json()['files']]
+
+
+host_slots = {}
+host_slots_lock = threading.Lock()
+
+
+def host_slot(url):
+    # Semaphore bounding the open connections to the host of url across all download threads
+    host = urlparse(url).netloc
+    with host_slots_lock:
+        if host not in host_slots:
+            host_slots[host] = threading.BoundedSemaphore(host_connections.get(host, default_host_connections))
+        return host_slots[host]
+
+
+def download_file(url, path, size, checksum):
+    # Stream url into path + '.part', resuming with a Range request after a dropped connection
+    # and hashing the bytes as they arrive. The file only gets its final name once size and
+    # checksum match. Returns the number of bytes transferred.
+    algorithm, expected = checksum.split(':', 1) if ':' in checksum else ('md5', checksum)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    part = path + '.part'
+    digest = hashlib.new(algorithm)
+    offset = 0
+    if os.path.exists(part):
+        # Hash what an earlier run already fetched, then continue after it
+        with open(part, 'rb') as f:
+            for chunk in iter(lambda: f.read(chunk_size), b''):
+                digest.update(chunk)
+                offset += len(chunk)
+        if offset > size:
+            os.remove(part)
+            digest = hashlib.new(algorithm)
+            offset = 0
+
+    transferred = 0
+    attempts = 0
+    while offset < size or not os.path.exists(part):
+        # Uncompressed, since offsets and the checksum refer to the file as stored
+        headers = {'Accept-Encoding': 'identity'}
+        if offset:
+            headers['Range'] = 'bytes={}-'.format(offset)
+        try:
+            with host_slot(url), UFOHTTP.get(url, headers=headers, stream=True, timeout=request_timeout) as r:
+                if r.status_code >= 400:
+                    raise Exception('{} returned status code {}'.format(url, r.status_code))
+                if offset and r.status_code != 206:
+                    # The server ignored the Range header and sends the whole file again
+                    digest = hashlib.new(algorithm)
+                    offset = 0
+                with open(part, 'ab' if offset else 'wb') as f:
+                    for chunk in r.iter_content(chunk_size):
+                        f.write(chunk)
+                        digest.update(chunk)
+                        offset += len(chunk)
+                        transferred += len(chunk)
+            if offset >= size:
+                break
+        except requests.exceptions.RequestException as e:
+            print(colored('Connection to {} dropped at {} of {} bytes: {}'.format(urlparse(url).netloc, offset, size, e.__class__.__name__), 'yellow'))
+        attempts += 1
+        if attempts > download_retries:
+            raise Exception('Too many interrupted transfers of {}, {} of {} bytes are kept for the next run'.format(os.path.basename(path), offset, size))
+        time.sleep(retry_pause)
+
+    if offset != size or digest.hexdigest() != expected:
+        os.remove(part)
+        raise Exception('Checksum of {} is incorrect, the file is deleted'.format(os.path.basename(path)))
+    os.replace(part, path)
+    return transferred
+
+
+def store_path(checksum):
+    # 'md5:0a1b...' is stored as store/md5/0a/0a1b...
+    algorithm, digest = checksum.split(':', 1) if ':' in checksum else ('md5', checksum)
+    return os.path.join(store_folder, algorithm, digest[:2], digest)
+
+
+blob_locks = {}
+blob_locks_lock = threading.Lock()
+
+
+def blob_lock(blob):
+    # Two records sharing a file download it once, the second waits for the first
+    with blob_locks_lock:
+        return blob_locks.setdefault(blob, threading.Lock())
+
+
+def link_blob(blob, path):
+    # Make path point at the stored blob: a hardlink where possible, a symlink across
+    # filesystems, and a plain copy where neither is allowed
+    if os.path.lexists(path):
+        if os.path.exists(path) and os.path.samefile(blob, path):
+            return
+        os.remove(path)
+    try:
+        os.link(blob, path)
+    except OSError:
+        try:
+            os.symlink(blob, path)
+        except OSError:
+            shutil.copy2(blob, path)
+
+
+def download_record(doi, foldername):
+    # Download every file of one Zenodo record into foldername
+    start = time.time()
+    size = 0
+    try:
+        try:
+            files = record_files(doi)
+        except Exception:
+            # Leave records the API cannot describe to zenodo_get, run in a separate process
+            # since it changes directory and exits on failure
+            files = None
+        if files is None:
+            staging = os.path.join(foldername, '.' + doi.replace('/', '_') + '.part')
+            try:
+                # Download model files from zenodo using zenodo_get created by David Volgyes
+                if subprocess.run([sys.executable, '-m', 'zenodo_get', doi, '-o', staging]).returncode != 0:
+                    raise Exception('zenodo_get could not download {}'.format(doi))
+                for _file in os.listdir(staging):
+                    size += os.path.getsize(os.path.join(staging, _file))
+                    os.replace(os.path.join(staging, _file), os.path.join(foldername, _file))
+            finally:
+                shutil.rmtree(staging, ignore_errors=True)
+        else:
+            for _file in files:
+                blob = store_path(_file['checksum'])
+                with blob_lock(blob):
+                    if not os.path.exists(blob):
+                        size += download_file(_file['url'], blob, _file['size'], _file['checksum'])
+                link_blob(blob, os.path.join(foldername, _file['key']))
+        return {'doi': doi, 'ok': True, 'bytes': size, 'seconds': time.time() - start, 'error': ''}
+    except Exception as e:
+        return {'doi': doi, 'ok': False, 'bytes': size, 'seconds': time.time() - start, 'error': str(e)}
+
+
+def download_records(dois, foldername, workers=None):
+    # Download several records at once, one bad DOI does not stop the others
+    workers = download_workers if workers is None else workers
+    start = time.time()
+    results = {}
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(dois)))) as pool:
+        futures = {pool.submit(download_record, doi, foldername): doi for doi in dois}
+        for future in as_completed(futures):
+            result = future.result()
+            results[result['doi']] = result
+            status = colored('DONE', 'green') if result['ok'] else colored('FAILED', 'red')
+            print('{}: {}'.format(result['doi'], status))
+    elapsed = time.time() - start
+
+    results = [results[doi] for doi in dois]
+    print(tabulate([[i['doi'], 'OK' if i['ok'] else 'FAILED', '{:.1f}'.format(i['bytes'] / 2 ** 20), '{:.1f}'.format(i['seconds']), i['error']] for i in results],
+                   headers=['Model DOI', 'Status', 'Size (MB)', 'Time (s)', 'Error']))
+    total = sum(i['bytes'] for i in results)
+    print('Downloaded {} of {} models, {:.1f} MB in {:.1f} s ({:.2f} MB/s)'.format(
+        sum(i['ok'] for i in results), len(results), total / 2 ** 20, elapsed, total / 2 ** 20 / max(elapsed, 1e-6)))
+    return results
+
+
 def Downloader(Github_Access_Token, filelist=None):
     global api_path
+    catalog = open_catalog()
     print('Here is the UFOModel metadata file list.')
     if not filelist:
-        print("\n".join(list(os.listdir('.'))))
+        print("\n".join(i[0] for i in catalog.execute('SELECT file FROM models ORDER BY file')))
     else:
         print("\n".join(filelist))
 
@@ -249,9 +773,10 @@ def Downloader(Github_Access_Token, filelist=None):
     download_list = [f.strip() for f in download_command.split(',')]
     download_doi = []
     for file in download_list:
-        with open(file,encoding='utf-8') as metadata:
-            metadatafile = json.load(metadata)
-        download_doi.append(metadatafile['Model Doi'])
+        model = catalog.execute('SELECT model_doi FROM models WHERE file = ?', (file,)).fetchone()
+        if model is None:
+            raise Exception(colored('Metadata file {} is not in the catalog'.format(file), 'red'))
+        download_doi.append(model[0])
 
     os.chdir(api_path)
 
@@ -263,22 +788,24 @@ def Downloader(Github_Access_Token, filelist=None):
     except FileExistsError:
         os.chdir(foldername)
 
-    # Download model files from zenodo using zenodo_get created by David Volgyes
-    for i in download_doi:
-        single_download_doi = []
-        single_download_doi.append(i)
-        zenodo_get.zenodo_get(single_download_doi)
-
-    print('You have successfully downloaded your needed models in %s under the same path with this python script.' %(foldername))
+    results = download_records(download_doi, os.getcwd())
+    if all(i['ok'] for i in results):
+        print('You have successfully downloaded your needed models in %s under the same path with this python script.' %(foldername))
+    else:
+        print(colored('Some models could not be downloaded, the others are in %s under the same path with this python script.' %(foldername), 'yellow'))
 
 def Search_Download(Github_Access_Token):
     jsonlist = Search(Github_Access_Token)
     Downloader(Github_Access_Token, jsonlist)
 
 def Delete():
+    # The metadata cache is kept for the next run, only leave it
     global api_path
     os.chdir(api_path)
-    shutil.rmtree('MetadatafilesTemporaryFolder')
+
+
+def Clear_Cache():
+    shutil.rmtree(cache_path, ignore_errors=True)
 
 def UFODownload(command):
     global api_path
@@ -305,8 +832,30 @@ if __name__ == '__main__':
                 'Search and Download': Search_Download}
 
     parser = argparse.ArgumentParser()
-    parser.add_argument('command', choices=FUNCTION_MAP.keys())
+    parser.add_argument('command', choices=list(FUNCTION_MAP.keys()) + ['query'])
+    parser.add_argument('-q', '--query', action='append', default=[],
+                        help='query for the "query" command, can be given several times')
+    parser.add_argument('-f', '--query-file',
+                        help='file with one query per line for the "query" command, - reads standard input')
+    parser.add_argument('--offline', action='store_true',
+                        help='run the "query" command on the local metadata cache without syncing')
     args = parser.parse_args()
+
+    if args.command == 'query':
+        # Non-interactive: the token is read from GITHUB_TOKEN, the public repository archive works without one
+        api_path = os.getcwd()
+        if not args.offline:
+            AccessGitRepo(Github_Access_Token=os.environ.get('GITHUB_TOKEN', ''))
+        Delete()
+        queries = list(args.query)
+        if args.query_file == '-':
+            queries += sys.stdin.readlines()
+        elif args.query_file:
+            with open(args.query_file, encoding='utf-8') as f:
+                queries += f.readlines()
+        Query_Stream(queries)
+        sys.exit(0)
+
     RunFunction = FUNCTION_MAP[args.command]
 
     Github_Access_Token = getpass('Please enter you Github access token:')
@@ -0,0 +1,60 @@
+import posixpath
+from github import InputGitTreeElement
+from termcolor import colored
+
+# Shared helpers for the UFOMetadata GitHub repository, used by both UFOUpload and UFODownload.
+# Kept compatible with Python 2 since UFOUpload still supports it.
+
+metadata_repo = 'Neubauer-Group/UFOMetadata'
+raw_repo_url = 'https://raw.githubusercontent.com/Neubauer-Group/UFOMetadata/main/'
+
+
+def metadata_tree(repo, path='Metadata', ref='main'):
+    # List every json file under path as {path relative to repo root: git blob sha}.
+    # The contents API stops at 1000 entries per directory, the git trees API does not,
+    # and a truncated recursive tree is walked one directory at a time instead.
+    root = repo.get_git_tree(ref)
+    tree_sha = None
+    for entry in root.tree:
+        if entry.path == path and entry.type == 'tree':
+            tree_sha = entry.sha
+            break
+    if tree_sha is None:
+        raise Exception(colored('Directory "{}" not found in {}'.format(path, metadata_repo), 'red'))
+    return walk_tree(repo, tree_sha, path)
+
+
+def walk_tree(repo, tree_sha, prefix):
+    listing = {}
+    tree = repo.get_git_tree(tree_sha, recursive=True)
+    if not tree.raw_data.get('truncated', False):
+        for entry in tree.tree:
+            if entry.type == 'blob' and entry.path.endswith('.json'):
+                listing[posixpath.join(prefix, entry.path)] = entry.sha
+        return listing
+
+    tree = repo.get_git_tree(tree_sha)
+    for entry in tree.tree:
+        if entry.type == 'tree':
+            listing.update(walk_tree(repo, entry.sha, posixpath.join(prefix, entry.path)))
+        elif entry.type == 'blob' and entry.path.endswith('.json'):
+            listing[posixpath.join(prefix, entry.path)] = entry.sha
+    return listing
+
+
+def metadata_names(repo):
+    # {metadata file name: path in the repository}, the names are what uploads must not collide with
+    return dict((posixpath.basename(i), i) for i in metadata_tree(repo))
+
+
+def commit_files(repo, files, message, branch='main'):
+    # Add files ({path in the repository: text content}) to branch in a single commit through the
+    # git data API: one tree holding all of them on top of the branch, one commit, one ref update.
+    # Nothing changes on the branch unless the last step succeeds. Returns the sha of the commit.
+    ref = repo.get_git_ref('heads/' + branch)
+    parent = repo.get_git_commit(ref.object.sha)
+    elements = [InputGitTreeElement(path, '100644', 'blob', content=files[path]) for path in sorted(files)]
+    tree = repo.create_git_tree(elements, parent.tree)
+    commit = repo.create_git_commit(message, tree, [parent])
+    ref.edit(commit.sha)
+    return commit.sha
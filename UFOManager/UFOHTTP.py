@@ -0,0 +1,233 @@
+import os
+import time
+import threading
+import email.utils
+import requests
+from requests.adapters import HTTPAdapter
+from termcolor import colored
+try:
+    from urllib.parse import urlparse
+except ImportError:
+    from urlparse import urlparse
+
+# One HTTP transport for every call UFOUpload and UFODownload make to Zenodo, doi.org, arXiv and
+# GitHub: a requests.Session per process keeping connections alive, default timeouts, and retries
+# with exponential backoff on 429 and 5xx answers that follow the Retry-After header.
+
+request_timeout = 30
+request_retries = 5
+retry_backoff = 1
+max_retry_wait = 60
+retry_statuses = (429, 500, 502, 503, 504)
+# Requests that can be sent again after a 5xx or a dropped connection without side effects.
+# Other methods (the POSTs creating and publishing depositions) are only retried when the
+# server refused them with 429 or the connection was never made.
+idempotent_methods = ('GET', 'HEAD', 'PUT', 'DELETE', 'OPTIONS')
+# Connections kept open per host, at least as many as threads talking to one host at once
+pool_size = 16
+# Ask for compressed responses; download_file turns this off for the files it checksums
+use_gzip = True
+
+# Calls are paced per API so bulk operations stay under the rate limits instead of failing partway.
+# Each host has a token bucket of (calls per second, calls that can be made at once), and the
+# X-RateLimit-Remaining/-Reset headers of its answers make calls wait for the quota to reset once
+# it is used up. 'github-write' paces content-creating GitHub calls made through PyGithub.
+rate_limits = {'zenodo.org': (100 / 60.0, 20),
+               'api.github.com': (5000 / 3600.0, 100),
+               'github-write': (500 / 3600.0, 80)}
+# Longest wait for a quota to reset before a call is sent anyway and left to fail
+max_quota_wait = 3600
+# GitHub calls made through PyGithub wait for the reset when fewer than this many are left
+github_reserve = 50
+
+sessions = {}
+sessions_lock = threading.Lock()
+buckets = {}
+quotas = {}
+in_flight = {}
+schedule_lock = threading.Lock()
+
+
+class TokenBucket(object):
+    # Allows rate calls per second on average and up to capacity at once. Calls that find the
+    # bucket empty reserve their token anyway and sleep until it is refilled, in arrival order.
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.time()
+        self.lock = threading.Lock()
+
+    def take(self, n=1):
+        with self.lock:
+            now = time.time()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= n
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0
+        if wait > 0:
+            time.sleep(wait)
+
+
+def bucket(name):
+    with schedule_lock:
+        if name not in buckets and name in rate_limits:
+            buckets[name] = TokenBucket(*rate_limits[name])
+        return buckets.get(name)
+
+
+def pause(seconds, name):
+    if seconds > 5:
+        print(colored('Rate limit of {} reached, waiting {:.0f} s'.format(name, seconds), 'yellow'))
+    time.sleep(seconds)
+
+
+def schedule(host, max_wait):
+    # Wait until host may be called again: for its quota to reset when it is used up (unless
+    # that takes longer than max_wait), then for a token of its bucket
+    with schedule_lock:
+        quota = quotas.get(host)
+        wait = 0
+        if quota is not None:
+            if quota['remaining'] <= 0:
+                wait = quota['reset'] - time.time()
+            quota['remaining'] -= 1
+        in_flight[host] = in_flight.get(host, 0) + 1
+    if 0 < wait <= max_wait:
+        pause(wait, host)
+    host_bucket = bucket(host)
+    if host_bucket is not None:
+        host_bucket.take()
+
+
+def note_quota(host, r):
+    # Remember the quota an answer reports, less the calls still waiting for their answers.
+    # The reset is a Unix time, or seconds from now for APIs that send a small number.
+    # r is None when the call got no answer.
+    with schedule_lock:
+        in_flight[host] -= 1
+        try:
+            remaining = int(r.headers['X-RateLimit-Remaining'])
+            reset = float(r.headers['X-RateLimit-Reset'])
+        except (AttributeError, KeyError, ValueError):
+            return
+        if reset < 1e9:
+            reset += time.time()
+        if host in quotas and reset < quotas[host]['reset']:
+            # Answer to a call sent before the quota was last reset
+            return
+        quotas[host] = {'remaining': remaining - in_flight[host], 'reset': reset}
+
+
+def quota_wait(host):
+    with schedule_lock:
+        quota = quotas.get(host)
+        return max(0, quota['reset'] - time.time()) if quota is not None else None
+
+
+def github_pace(github_object, writes=0):
+    # PyGithub keeps its own connection, so its calls are paced here: wait for the hourly quota
+    # of the token to reset when it is nearly used up, and spread calls creating content
+    # (files, pull requests) over GitHub's secondary limits
+    requester = getattr(github_object, '_requester', None)
+    remaining, limit = getattr(requester, 'rate_limiting', (-1, -1))
+    reset = getattr(requester, 'rate_limiting_resettime', 0)
+    if 0 <= remaining < github_reserve and reset > time.time():
+        pause(reset - time.time(), 'GitHub')
+    if writes:
+        bucket('github-write').take(writes)
+
+
+def session():
+    # The shared session of this process, a new one after a fork since sockets must not be shared
+    with sessions_lock:
+        pid = os.getpid()
+        if pid not in sessions:
+            s = requests.Session()
+            adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+            s.mount('https://', adapter)
+            s.mount('http://', adapter)
+            if not use_gzip:
+                s.headers['Accept-Encoding'] = 'identity'
+            sessions.clear()
+            sessions[pid] = s
+        return sessions[pid]
+
+
+def retry_after(r):
+    # Seconds asked for by a Retry-After header (a number or an HTTP date), None without one
+    value = r.headers.get('Retry-After')
+    if value is None:
+        return None
+    try:
+        return max(0, float(value))
+    except ValueError:
+        date = email.utils.parsedate_tz(value)
+        return max(0, email.utils.mktime_tz(date) - time.time()) if date else None
+
+
+def request(method, url, **kwargs):
+    # requests.request through the shared session. retries=N overrides request_retries and
+    # max_quota_wait=N the longest wait for a used up quota. A file object given as data is
+    # rewound before it is sent again.
+    retries = kwargs.pop('retries', request_retries)
+    max_wait = kwargs.pop('max_quota_wait', max_quota_wait)
+    kwargs.setdefault('timeout', request_timeout)
+    method = method.upper()
+    body = kwargs.get('data')
+    start = body.tell() if hasattr(body, 'seek') and hasattr(body, 'tell') else None
+    host = urlparse(url).netloc
+    attempt = 0
+    while True:
+        schedule(host, max_wait)
+        try:
+            r = session().request(method, url, **kwargs)
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+            note_quota(host, None)
+            never_sent = isinstance(e, requests.exceptions.ConnectTimeout)
+            if attempt >= retries or not (never_sent or method in idempotent_methods):
+                raise
+            wait = None
+        except Exception:
+            note_quota(host, None)
+            raise
+        else:
+            note_quota(host, r)
+            # GitHub answers 403 instead of 429 when the quota is used up
+            limited = r.status_code == 429 or (r.status_code == 403 and r.headers.get('X-RateLimit-Remaining') == '0')
+            if attempt >= retries or not (limited or r.status_code in retry_statuses):
+                return r
+            if not limited and method not in idempotent_methods:
+                return r
+            wait = retry_after(r)
+            if wait is None and limited:
+                wait = quota_wait(host)
+            if limited and wait is not None and wait > max_wait:
+                return r
+            r.close()
+        if wait is None:
+            wait = retry_backoff * 2 ** attempt
+        time.sleep(min(wait, max_retry_wait))
+        attempt += 1
+        if start is not None:
+            body.seek(start)
+
+
+def get(url, **kwargs):
+    return request('GET', url, **kwargs)
+
+
+def head(url, **kwargs):
+    return request('HEAD', url, **kwargs)
+
+
+def post(url, **kwargs):
+    return request('POST', url, **kwargs)
+
+
+def put(url, **kwargs):
+    return request('PUT', url, **kwargs)
+
+
+def delete(url, **kwargs):
+    return request('DELETE', url, **kwargs)
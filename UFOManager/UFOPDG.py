@@ -0,0 +1,41 @@
+from collections import OrderedDict
+from particle import PDGID
+
+# One memoized lookup of the PDG ID properties used by UFOUpload and UFODownload.
+
+# Codes around the Standard Model range are classified once at import, anything else
+# (mostly BSM codes) is kept in a bounded least-recently-used table
+sm_code_range = range(-100, 101)
+lru_size = 4096
+
+
+def classify(pdg_code):
+    pdgid = PDGID(pdg_code)
+    is_valid = pdgid.is_valid
+    return {'is_valid': is_valid,
+            'three_charge': pdgid.three_charge if is_valid else None,
+            'j_spin': pdgid.j_spin if is_valid else None,
+            'is_sm': bool(pdgid.is_sm_quark or pdgid.is_sm_lepton or pdgid.is_sm_gauge_boson_or_higgs)}
+
+
+sm_table = dict((code, classify(code)) for code in sm_code_range)
+lru_table = OrderedDict()
+
+
+def pdg_properties(pdg_code):
+    # {'is_valid', 'three_charge', 'j_spin', 'is_sm'} of a pdg code in a single lookup
+    if pdg_code in sm_table:
+        return sm_table[pdg_code]
+    if pdg_code in lru_table:
+        properties = lru_table.pop(pdg_code)
+    else:
+        properties = classify(pdg_code)
+        if len(lru_table) >= lru_size:
+            lru_table.popitem(last=False)
+    lru_table[pdg_code] = properties
+    return properties
+
+
+def is_sm_elementary(pdg_code):
+    # Standard Model quarks, leptons, gauge bosons and the Higgs
+    return pdg_properties(pdg_code)['is_sm']
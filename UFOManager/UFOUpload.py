@@ -5,21 +5,576 @@ import shutil
 import sys
 import json
 import importlib
-import requests
 from github import Github
 from getpass import getpass
 import argparse
 from termcolor import colored, cprint
 import re
 import datetime
-from particle import PDGID
+import time
+import tempfile
+import multiprocessing
+import hashlib
+import ast
+import threading
+import mmap
+import posixpath
+try:
+    import queue
+except ImportError:
+    import Queue as queue
+from UFOManager.UFOPDG import pdg_properties
+from UFOManager.UFOGitHub import metadata_repo, raw_repo_url, metadata_names, commit_files
+from UFOManager.UFOCache import cache_path
+from UFOManager import UFOHTTP
 
 if sys.version_info.major == 3:
     raw_input = input
+    import importlib.util
 
 regex = r'[^@]+@[^@]+\.[^@]+'
 
-def validator(model_path):
+# Models validated at the same time by validator_all, and seconds after which one is stopped (None for no limit)
+validation_workers = multiprocessing.cpu_count()
+validation_timeout = None
+
+# Import models straight from their archives instead of extracting them to ModelFolder (Python 3 only)
+validate_in_memory = False
+
+# Read the model definitions from the source instead of importing it, so no model code is executed (Python 3 only)
+validate_static = False
+
+# Validation results are cached under the hash of the model files, the validator version and the
+# Python version. Bump validator_version whenever the checks in check_model change.
+validator_version = '1'
+validation_cache = os.path.join(cache_path, 'validation')
+
+# Paper and homepage links are checked concurrently, link_timeout seconds at most per request.
+# Results are kept in link_cache, working links for link_ttl seconds and broken ones for
+# link_failure_ttl seconds, so a batch of models does not check a shared link again.
+link_workers = 16
+link_timeout = 10
+link_ttl = 7 * 24 * 3600
+link_failure_ttl = 600
+link_cache = os.path.join(cache_path, 'links.json')
+
+# Model archives are streamed to Zenodo from a memory map, and an upload that fails or that Zenodo
+# stores with another size or checksum is sent again, upload_retries times at most.
+upload_retries = 3
+# Seconds to wait for Zenodo to answer once a file is sent, storing a large file takes a while
+upload_timeout = 600
+# upload_state is a journal of every stage of the upload of each model folder: the names chosen,
+# the draft deposition with its bucket and reserved DOI, the files stored in it, the metadata set,
+# the commit to the fork and the publishing. Each record is written to disk before the next stage
+# starts, so an interrupted upload continues with the same draft instead of creating a new one,
+# and a --resume run carries on after the last stage recorded.
+upload_state = os.path.join(cache_path, 'uploads.journal')
+upload_state_lock = threading.Lock()
+
+# uploader_all runs as a pipeline: models are validated in the background while the ones validated
+# so far are named and uploaded to Zenodo in upload_workers threads. At most pipeline_queue_size
+# models wait between two stages. Their metadata goes to the fork in one commit at the end.
+upload_workers = 4
+pipeline_queue_size = 4
+
+# newversion_all looks models up in an index of all depositions of the account, read page by page
+# (deposition_page_size per page). The pages are kept in deposition_cache with their ETags, so
+# pages Zenodo reports unchanged are not downloaded again.
+deposition_page_size = 100
+deposition_cache = os.path.join(cache_path, 'depositions.json')
+
+# Settings validate_model hands to its worker processes, which start without them
+worker_settings = ['validator_version', 'cache_path', 'validation_cache', 'link_workers', 'link_timeout',
+                   'link_ttl', 'link_failure_ttl', 'link_cache']
+
+def validation_key(model_path, static=False):
+    # Hash of everything the validation result depends on, None when the model is a plain
+    # directory since validating it turns it into an archive
+    files = sorted(os.listdir(model_path))
+    if any(os.path.isdir(os.path.join(model_path, _file)) for _file in files):
+        return None
+    key = hashlib.sha256()
+    key.update('{}:{}'.format(validator_version, sys.version_info.major).encode('utf-8'))
+    if static:
+        key.update(b'static')
+    for _file in files:
+        key.update(_file.encode('utf-8') + b'\0')
+        with open(os.path.join(model_path, _file), 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                key.update(chunk)
+    return key.hexdigest()
+
+
+def validator(model_path, use_cache=True, in_memory=None, static=None):
+    # Run check_model, or return its earlier result when neither the model archive,
+    # metadata.json nor the validator changed since the last successful validation
+    static = validate_static if static is None else static
+    static = static and sys.version_info.major == 3
+    key = validation_key(model_path, static) if use_cache else None
+    if key is not None:
+        try:
+            with open(os.path.join(validation_cache, key + '.json')) as f:
+                result = tuple(json.load(f))
+            print("\nChecking Model: " + colored(model_path, "magenta") + "\n")
+            print('Model and metadata unchanged since the last validation: ' + colored('PASSED!', 'green'))
+            return result
+        except (IOError, OSError, ValueError):
+            pass
+
+    in_memory = validate_in_memory if in_memory is None else in_memory
+    try:
+        result = check_model(model_path, in_memory = in_memory and sys.version_info.major == 3, static = static)
+    finally:
+        remove_archive_finders()
+
+    if key is not None:
+        try:
+            os.makedirs(validation_cache)
+        except OSError:
+            pass
+        tmp = os.path.join(validation_cache, key + '.tmp{}'.format(os.getpid()))
+        with open(tmp, 'w') as f:
+            json.dump(result, f)
+        try:
+            os.rename(tmp, os.path.join(validation_cache, key + '.json'))
+        except OSError:
+            os.remove(tmp)
+    return result
+
+
+def metadata_links(file):
+    # Links given in the metadata.json of a model that have to resolve
+    links = []
+    if 'doi' in file.get('Paper_id', {}):
+        links.append('https://doi.org/' + file['Paper_id']['doi'])
+    if 'arXiv' in file.get('Paper_id', {}):
+        links.append('https://arxiv.org/abs/' + file['Paper_id']['arXiv'])
+    if 'Model Homepage' in file:
+        links.append(file['Model Homepage'])
+    return links
+
+
+def link_status(url, timeout):
+    # HTTP status of url, None if it cannot be reached. HEAD avoids downloading the page, a
+    # streamed GET (closed without reading the body) covers servers that do not answer HEAD.
+    try:
+        r = UFOHTTP.head(url, allow_redirects=True, timeout=timeout, retries=1)
+        if r.status_code < 400:
+            return r.status_code
+        r = UFOHTTP.get(url, allow_redirects=True, timeout=timeout, stream=True, retries=1)
+        r.close()
+        return r.status_code
+    except Exception:
+        return None
+
+
+def load_link_cache():
+    try:
+        with open(link_cache) as f:
+            return json.load(f)
+    except (IOError, OSError, ValueError):
+        return {}
+
+
+def save_link_cache(results):
+    # Merge with what other processes wrote in the meantime, then replace the file in one step
+    cache = load_link_cache()
+    cache.update(results)
+    try:
+        os.makedirs(cache_path)
+    except OSError:
+        pass
+    tmp = link_cache + '.tmp{}'.format(os.getpid())
+    with open(tmp, 'w') as f:
+        json.dump(cache, f)
+    try:
+        os.rename(tmp, link_cache)
+    except OSError:
+        os.remove(tmp)
+
+
+def check_links(urls, workers=None, timeout=None):
+    # {url: True if it resolves} for all urls, each distinct url is checked at most once and
+    # only when there is no fresh result in link_cache
+    workers = link_workers if workers is None else workers
+    timeout = link_timeout if timeout is None else timeout
+    now = time.time()
+    cache = load_link_cache()
+    results = {}
+    pending = []
+    for url in set(urls):
+        if url in cache:
+            status, checked = cache[url]
+            ok = status is not None and status < 400
+            if now - checked < (link_ttl if ok else link_failure_ttl):
+                results[url] = ok
+                continue
+        pending.append(url)
+
+    checked = {}
+    lock = threading.Lock()
+    def work():
+        while True:
+            with lock:
+                if not pending:
+                    return
+                url = pending.pop()
+            status = link_status(url, timeout)
+            with lock:
+                checked[url] = [status, time.time()]
+
+    threads = [threading.Thread(target=work) for i in range(min(max(1, workers), len(pending)))]
+    for thread in threads:
+        thread.daemon = True
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    if checked:
+        save_link_cache(checked)
+    for url, (status, t) in checked.items():
+        results[url] = status is not None and status < 400
+    return results
+
+
+def unpack_model(original_file):
+    '''    Unpack the model inside a directory called "ModelFolder"     '''
+    
+    for _file in original_file:
+        if _file.endswith('.json'):
+            pass
+        elif _file.endswith('.zip'):
+            with zipfile.ZipFile(_file, 'r') as zip:
+                zip.extractall('ModelFolder')
+        elif _file.endswith('.tar') or _file.endswith('.tgz') or _file.endswith('.tar.gz'):
+            tarfile.open(_file).extractall('ModelFolder')
+        elif os.path.isdir(_file):
+            cf = tarfile.open( _file + ".tgz", "w:gz")
+            for _f in os.listdir(_file):
+                cf.add(_file + '/' + _f)
+            cf.close()
+            shutil.move(_file, 'ModelFolder')
+            original_file.remove(_file)
+            original_file.append(_file + ".tgz")
+        else:
+            raise Exception(colored("Valid Format for UFO directory not found", "red"))
+
+                
+    '''    Check if the compressed folder contains a single model and
+           reorganize its content inside a directory called "ModelFolder"    '''
+    
+    ModelFolder_Files = os.listdir('ModelFolder')
+    if '__init__.py' not in ModelFolder_Files:
+        if len(ModelFolder_Files) != 1:
+            raise Exception(colored('Uncompressed content has too many files/folders', 'red'))
+        if '__init__.py' not in os.listdir('ModelFolder/' + ModelFolder_Files[0]):
+            raise Exception(colored('"__init__.py" not available within model, not a Python Package!', 'red'))
+        for _file in os.listdir('ModelFolder/' + ModelFolder_Files[0]):
+            if _file == "__pycache__" or _file.endswith(".pyc") or _file.endswith("~"):
+                shutil.rmtree('ModelFolder/' + ModelFolder_Files[0] + '/' + _file)
+                continue
+            shutil.copy('ModelFolder/' + ModelFolder_Files[0] + '/' +  _file, 'ModelFolder/' +  _file)
+        shutil.rmtree('ModelFolder/' + ModelFolder_Files[0])
+
+
+class ArchiveFinder(object):
+    # Import hook serving the Python files of a model archive without extracting it. The model is
+    # importable both as the package "ModelFolder" and through its top-level modules (particles,
+    # object_library, ...), the same way as an extracted ModelFolder on sys.path.
+    def __init__(self, read, files, compiled=(), archive=None):
+        # read(name) returns the source of files[name], files maps paths relative to the model root
+        # (already flattened out of a single top directory) to archive members. compiled holds
+        # the other members (.pyc, .so, ...) the same way. archive is the open archive read
+        # comes from, closed along with the finder.
+        self.read = read
+        self.files = files
+        self.compiled = set(compiled_module(i) for i in compiled)
+        self.archive = archive
+
+    def source_path(self, fullname):
+        parts = fullname.split('.')
+        if parts[0] == 'ModelFolder':
+            parts = parts[1:]
+        path = '/'.join(parts)
+        if path + '/__init__.py' in self.files or (not path and '__init__.py' in self.files):
+            return (path + '/__init__.py').lstrip('/'), True
+        if path + '.py' in self.files:
+            return path + '.py', False
+        return None, False
+
+    def find_spec(self, fullname, path=None, target=None):
+        source, is_package = self.source_path(fullname)
+        if source is None:
+            return None
+        spec = importlib.util.spec_from_loader(fullname, self, origin=source, is_package=is_package)
+        spec.has_location = False
+        return spec
+
+    def create_module(self, spec):
+        return None
+
+    def exec_module(self, module):
+        source, is_package = self.source_path(module.__name__)
+        module.__file__ = source
+        code = compile(self.read(self.files[source]), source, 'exec')
+        exec(code, module.__dict__)
+
+    def close(self):
+        self.read = None
+        if self.archive is not None:
+            self.archive.close()
+            self.archive = None
+
+
+def compiled_module(path):
+    # Module path ('dir/name') a compiled member such as 'dir/__pycache__/name.cpython-38.pyc' would be imported as
+    folder, name = posixpath.split(path.replace('/__pycache__', ''))
+    return posixpath.join(folder, name.split('.')[0])
+
+
+def compiled_members(names):
+    return [i for i in names if i.endswith('.pyc') or i.endswith('.pyo') or i.endswith('.so') or i.endswith('.pyd')]
+
+
+class StaticObject(object):
+    # Stand-in for a UFO object, holding the literal arguments of its constructor call.
+    # Positional arguments follow the order of the UFO object_library.
+    require_args = ['name']
+
+    def __init__(self, *args, **options):
+        for name, value in zip(self.require_args, args):
+            setattr(self, name, value)
+        for name, value in options.items():
+            setattr(self, name, value)
+
+
+class StaticParticle(StaticObject):
+    require_args = ['pdg_code', 'name', 'antiname', 'spin', 'color', 'mass', 'width', 'texname', 'antitexname', 'charge']
+    GhostNumber = 0
+    LeptonNumber = 0
+    Y = 0
+
+    def anti(self):
+        # Same conventions as Particle.anti() of the UFO object_library
+        options = dict(self.__dict__)
+        options.update({'pdg_code': -self.pdg_code, 'name': self.antiname, 'antiname': self.name,
+                        'texname': getattr(self, 'antitexname', None), 'antitexname': getattr(self, 'texname', None),
+                        'charge': -self.charge, 'GhostNumber': -self.GhostNumber,
+                        'LeptonNumber': -self.LeptonNumber, 'Y': -self.Y})
+        return StaticParticle(**options)
+
+
+class StaticParameter(StaticObject):
+    require_args = ['name', 'nature', 'type', 'value', 'texname']
+
+class StaticCTParameter(StaticObject):
+    require_args = ['name', 'type', 'value', 'texname']
+
+class StaticVertex(StaticObject):
+    require_args = ['name', 'particles', 'color', 'lorentz', 'couplings']
+
+class StaticCTVertex(StaticObject):
+    require_args = ['name', 'particles', 'color', 'lorentz', 'couplings', 'type', 'loop_particles']
+
+class StaticCouplingOrder(StaticObject):
+    require_args = ['name', 'expansion_order', 'hierarchy']
+
+class StaticCoupling(StaticObject):
+    require_args = ['name', 'value', 'order']
+
+class StaticLorentz(StaticObject):
+    require_args = ['name', 'spins', 'structure']
+
+class StaticPropagator(StaticObject):
+    require_args = ['name', 'numerator', 'denominator']
+
+class StaticDecay(StaticObject):
+    require_args = ['particle', 'partial_widths']
+
+
+static_classes = {'Particle': StaticParticle, 'Parameter': StaticParameter, 'CTParameter': StaticCTParameter,
+                  'Vertex': StaticVertex, 'CTVertex': StaticCTVertex, 'CouplingOrder': StaticCouplingOrder,
+                  'Coupling': StaticCoupling, 'Lorentz': StaticLorentz, 'Propagator': StaticPropagator,
+                  'Decay': StaticDecay}
+
+
+def static_value(node, namespace):
+    # Value of a constructor argument: literals and arithmetic on them are evaluated, names defined
+    # earlier in the same file are looked up, any other reference is kept as its source text
+    try:
+        return ast.literal_eval(node)
+    except (ValueError, TypeError, SyntaxError):
+        pass
+    if isinstance(node, ast.BinOp) and type(node.op) in (ast.Add, ast.Sub, ast.Mult, ast.Div):
+        left, right = static_value(node.left, namespace), static_value(node.right, namespace)
+        if isinstance(left, (int, float)) and isinstance(right, (int, float)):
+            if isinstance(node.op, ast.Add):
+                return left + right
+            if isinstance(node.op, ast.Sub):
+                return left - right
+            if isinstance(node.op, ast.Mult):
+                return left * right
+            return float(left) / right
+    if isinstance(node, ast.UnaryOp) and type(node.op) in (ast.USub, ast.UAdd):
+        value = static_value(node.operand, namespace)
+        if isinstance(value, (int, float)):
+            return -value if isinstance(node.op, ast.USub) else value
+    if isinstance(node, ast.Name) and node.id in namespace:
+        return namespace[node.id]
+    if isinstance(node, ast.List):
+        return [static_value(i, namespace) for i in node.elts]
+    if isinstance(node, ast.Tuple):
+        return tuple(static_value(i, namespace) for i in node.elts)
+    if isinstance(node, ast.Dict):
+        return dict((static_value(k, namespace), static_value(v, namespace)) for k, v in zip(node.keys, node.values))
+    parts = []
+    while isinstance(node, ast.Attribute):
+        parts.insert(0, node.attr)
+        node = node.value
+    if isinstance(node, ast.Name):
+        return '.'.join([node.id] + parts)
+    return None
+
+
+# Top-level "target = [module.]Class(" statements, and the name keyword of a constructor call
+static_statement = re.compile(r'^([A-Za-z_]\w*)[ \t]*=[ \t]*(?:([A-Za-z_]\w*)\.)?([A-Za-z_]\w*)[ \t]*\(', re.M)
+static_name = re.compile(r'''\bname\s*=\s*(['"])([^'"\\]*)\1''')
+
+
+class StaticFinder(ArchiveFinder):
+    # Import hook building the model modules from their source instead of running them.
+    # object_library provides the Static* classes, and every top-level "name = UFOClass(...)"
+    # (or "name = other.anti()") of the other files becomes a Static* object. Parsing a whole
+    # vertices.py with ast takes longer than importing it, so the statements are located by
+    # their first line and only the name is read from all but particles, whose statements are
+    # parsed one by one with ast. Everything else in the files is ignored. Modules the model only
+    # ships compiled cannot be read and are refused, rather than left to the regular import.
+    def find_spec(self, fullname, path=None, target=None):
+        spec = ArchiveFinder.find_spec(self, fullname, path, target)
+        parts = fullname.split('.')
+        if spec is None and '/'.join(parts[1:] if parts[0] == 'ModelFolder' else parts) in self.compiled:
+            raise ImportError('"{}" is only available compiled, which static validation does not run'.format(fullname), name=fullname)
+        return spec
+
+    def exec_module(self, module):
+        source, is_package = self.source_path(module.__name__)
+        module.__file__ = source
+        if source == 'object_library.py':
+            module.__dict__.update(static_classes)
+            return
+        text = self.read(self.files[source]).decode('utf-8', 'replace')
+        namespace = module.__dict__
+        statements = list(static_statement.finditer(text))
+        for i, match in enumerate(statements):
+            target, owner, func = match.groups()
+            statement = text[match.start():statements[i + 1].start() if i + 1 < len(statements) else len(text)]
+            if func == 'anti' and isinstance(namespace.get(owner), StaticParticle):
+                namespace[target] = namespace[owner].anti()
+                continue
+            if func not in static_classes:
+                continue
+            name = static_name.search(statement)
+            if func != 'Particle' and name:
+                namespace[target] = static_classes[func](name = name.group(2))
+                continue
+            try:
+                call = ast.parse(statement.strip(), source).body[0].value
+            except (SyntaxError, IndexError, AttributeError):
+                raise SyntaxError('Could not parse the definition of "{}" in {}'.format(target, source))
+            args = [static_value(i, namespace) for i in call.args]
+            options = dict((i.arg, static_value(i.value, namespace)) for i in call.keywords if i.arg)
+            namespace[target] = static_classes[func](*args, **options)
+
+def install_archive(model_path, original_file, finder=ArchiveFinder):
+    # Make the model archive importable through an ArchiveFinder (zipimport-style for zips, the
+    # Python members of tarballs read into memory in one pass). Only Python members are read and
+    # nothing is written to disk. Returns the names at the top level of the model.
+    remove_archive_finders()
+
+    _file = [i for i in original_file if not i.endswith('.json')][0]
+    archive_path = os.path.join(model_path, _file)
+    archive = None
+    if _file.endswith('.zip'):
+        archive = zipfile.ZipFile(archive_path, 'r')
+        members = [i for i in archive.namelist() if not i.endswith('/')]
+        read = archive.read
+    elif _file.endswith('.tar') or _file.endswith('.tgz') or _file.endswith('.tar.gz'):
+        members = []
+        sources = {}
+        with tarfile.open(archive_path) as archive:
+            for member in archive:
+                if member.isfile():
+                    members.append(member.name)
+                    if member.name.endswith('.py'):
+                        sources[member.name] = archive.extractfile(member).read()
+        read = sources.__getitem__
+        archive = None
+    else:
+        raise Exception(colored("Valid Format for UFO directory not found", "red"))
+
+    # Member names relative to the archive root, then to the model root
+    names = {}
+    for member in members:
+        name = member[2:] if member.startswith('./') else member
+        names[name] = member
+    ModelFolder_Files = sorted(set(i.split('/')[0] for i in names))
+    if '__init__.py' not in ModelFolder_Files:
+        if len(ModelFolder_Files) != 1 or ModelFolder_Files[0] + '/__init__.py' not in names:
+            if archive is not None:
+                archive.close()
+            if len(ModelFolder_Files) != 1:
+                raise Exception(colored('Uncompressed content has too many files/folders', 'red'))
+            raise Exception(colored('"__init__.py" not available within model, not a Python Package!', 'red'))
+        prefix = ModelFolder_Files[0] + '/'
+        names = dict((i[len(prefix):], member) for i, member in names.items() if i.startswith(prefix))
+
+    files = dict((i, member) for i, member in names.items() if i.endswith('.py'))
+    install_finder(finder(read, files, compiled_members(names), archive))
+    return sorted(set(i.split('/')[0] for i in names))
+
+
+def install_folder(folder, finder):
+    # Serve the Python files of an unpacked model folder through finder
+    files = {}
+    others = []
+    for root, dirs, names in os.walk(folder):
+        for name in names:
+            path = os.path.join(root, name)
+            if name.endswith('.py'):
+                files[os.path.relpath(path, folder).replace(os.sep, '/')] = path
+            else:
+                others.append(os.path.relpath(path, folder).replace(os.sep, '/'))
+    install_finder(finder(read_file, files, compiled_members(others)))
+
+
+def read_file(path):
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+def install_finder(finder):
+    # Modules of a model validated earlier in this process must not shadow those of this model
+    for name, module in list(sys.modules.items()):
+        if name == 'ModelFolder' or name.startswith('ModelFolder.') or isinstance(getattr(module, '__loader__', None), ArchiveFinder) \
+                or 'ModelFolder' in (getattr(module, '__file__', None) or ''):
+            del sys.modules[name]
+    sys.meta_path.insert(0, finder)
+
+
+def clear_model_folder(model_path):
+    # Undo the unpacking of a model, whether it went to ModelFolder or into an ArchiveFinder
+    os.chdir(model_path)
+    shutil.rmtree('ModelFolder', ignore_errors=True)
+    remove_archive_finders()
+
+
+def remove_archive_finders():
+    for finder in [i for i in sys.meta_path if isinstance(i, ArchiveFinder)]:
+        finder.close()
+        sys.meta_path.remove(finder)
+
+
+def check_model(model_path, in_memory=False, static=False):
 
     print("\nChecking Model: " + colored(model_path, "magenta") + "\n")
     '''    Check for necessary files and their formats   '''
@@ -70,14 +625,13 @@ def validator(model_path):
         raise Exception(colored('"Paper_id" field does not exist in metadata', 'red'))
     assert 'doi' in file['Paper_id'] or 'arXiv' in file['Paper_id'], \
         Exception(colored('"Paper_id" field does not contain doi or arXiv ID', 'red'))
+    links = check_links(metadata_links(file))
     if 'doi' in file['Paper_id']:
         url = 'https://doi.org/' + file['Paper_id']['doi']
-        doi_webpage = requests.get(url)
-        assert doi_webpage.status_code < 400, colored('DOI does not resolve to a valid paper', 'red')
+        assert links[url], colored('DOI does not resolve to a valid paper', 'red')
     if 'arXiv' in file['Paper_id']:
         url = 'https://arxiv.org/abs/' + file['Paper_id']['arXiv']
-        arXiv_webpage = requests.get(url)
-        assert arXiv_webpage.status_code < 400, colored('arxiv id does not resolve to a valid paper', 'red')
+        assert links[url], colored('arxiv id does not resolve to a valid paper', 'red')
     print('Check paper information in initial metadata:' + colored(' PASSED!', 'green'))
 
 
@@ -91,112 +645,82 @@ def validator(model_path):
     # Check uploaded metadata.json for Model Homepage if exists
 
     if 'Model Homepage' in file:
-        try:
-            assert requests.get(file['Model Homepage']).status_code < 400
-        except:
+        if not links[file['Model Homepage']]:
             raise Exception(colored('"Model Homepage" link is invalid in metadata', 'red'))
     
-    '''    Unpack the model inside a directory called "ModelFolder"     '''
-    
-    for _file in original_file:
-        if _file.endswith('.json'):
-            pass
-        elif _file.endswith('.zip'):
-            with zipfile.ZipFile(_file, 'r') as zip:
-                zip.extractall('ModelFolder')
-        elif _file.endswith('.tar') or _file.endswith('.tgz') or _file.endswith('.tar.gz'):
-            tarfile.open(_file).extractall('ModelFolder')
-        elif os.path.isdir(_file):
-            cf = tarfile.open( _file + ".tgz", "w:gz")
-            for _f in os.listdir(_file):
-                cf.add(_file + '/' + _f)
-            cf.close()
-            shutil.move(_file, 'ModelFolder')
-            original_file.remove(_file)
-            original_file.append(_file + ".tgz")
-        else:
-            raise Exception(colored("Valid Format for UFO directory not found", "red"))
-
-                
-    '''    Check if the compressed folder contains a single model and
-           reorganize its content inside a directory called "ModelFolder"    '''
-    
-    ModelFolder_Files = os.listdir('ModelFolder')
-    if '__init__.py' not in ModelFolder_Files:
-        if len(ModelFolder_Files) != 1:
-            raise Exception(colored('Uncompressed content has too many files/folders', 'red'))
-        if '__init__.py' not in os.listdir('ModelFolder/' + ModelFolder_Files[0]):
-            raise Exception(colored('"__init__.py" not available within model, not a Python Package!', 'red'))
-        for _file in os.listdir('ModelFolder/' + ModelFolder_Files[0]):
-            if _file == "__pycache__" or _file.endswith(".pyc") or _file.endswith("~"):
-                shutil.rmtree('ModelFolder/' + ModelFolder_Files[0] + '/' + _file)
-                continue
-            shutil.copy('ModelFolder/' + ModelFolder_Files[0] + '/' +  _file, 'ModelFolder/' +  _file)
-        shutil.rmtree('ModelFolder/' + ModelFolder_Files[0])
+    '''    Unpack the model inside a directory called "ModelFolder", or make it importable
+           straight from its archive when validating in memory    '''
+
+    if static:
+        print(colored('Static validation: the model files are parsed, not run', 'yellow'))
+        in_memory = True
+    if in_memory and any(os.path.isdir(_file) for _file in original_file):
+        in_memory = False
+    if in_memory:
+        ArchiveFiles = install_archive(model_path, original_file, StaticFinder if static else ArchiveFinder)
+    else:
+        unpack_model(original_file)
+        if static:
+            install_folder(os.path.join(model_path, 'ModelFolder'), StaticFinder)
 
 
     '''    Check if the model can be loaded as a python package    '''
     
-    sys.path.append(model_path)
-    modelloc = model_path + '/ModelFolder'
-    sys.path.insert(0,modelloc)
+    # A static validation imports through StaticFinder only, nothing of the model may be found on
+    # sys.path or in the working directory where the regular import would run it
+    on_path = not in_memory and not static
+    if on_path:
+        sys.path.append(model_path)
+        modelloc = model_path + '/ModelFolder'
+        sys.path.insert(0,modelloc)
 
     if sys.version_info.major == 3:
         try:
             UFOModel = importlib.import_module('ModelFolder')
         except SyntaxError:
-            os.chdir(model_path)
-            shutil.rmtree('ModelFolder')
+            clear_model_folder(model_path)
             raise Exception(colored('The model may be not compatible with Python3 or have invalid code syntaxes. Please check and try with Python2 instead',
                                     'red'))
         except ModuleNotFoundError:
-            os.chdir(model_path)
-            shutil.rmtree('ModelFolder')
+            clear_model_folder(model_path)
             raise Exception(colored('The model may be missing some files, please check again', 'red'))
         except AttributeError:
-            os.chdir(model_path)
-            shutil.rmtree('ModelFolder')
+            clear_model_folder(model_path)
             raise Exception(colored('Undefined variables in your imported modules, please check again', 'red'))
         except NameError:
-            os.chdir(model_path)
-            shutil.rmtree('ModelFolder')
+            clear_model_folder(model_path)
             raise Exception(colored('Some modules/variables not imported/defined, please check again', 'red'))
         except TypeError:
-            os.chdir(model_path)
-            shutil.rmtree('ModelFolder')
+            clear_model_folder(model_path)
             raise Exception(colored('At least one of the variables is missing required positional argument, please check again.','red'))
     else:
         try:
             UFOModel = importlib.import_module('ModelFolder')
         except SyntaxError:
-            os.chdir(model_path)
-            shutil.rmtree('ModelFolder')
+            clear_model_folder(model_path)
             raise Exception('Your model may have invalid syntaxes, please check again')
         except ImportError:
-            os.chdir(model_path)
-            shutil.rmtree('ModelFolder')
+            clear_model_folder(model_path)
             raise Exception(colored('The model may be missing some files, please check again', 'red'))
         except AttributeError:
-            os.chdir(model_path)
-            shutil.rmtree('ModelFolder')
+            clear_model_folder(model_path)
             raise Exception(colored('Undefined variables in your imported modules, please check again', 'red'))
         except NameError:
-            os.chdir(model_path)
-            shutil.rmtree('ModelFolder')
+            clear_model_folder(model_path)
             raise Exception(colored('Some modules/variables not imported/defined, please check again', 'red'))
         except TypeError:
-            os.chdir(model_path)
-            shutil.rmtree('ModelFolder')
+            clear_model_folder(model_path)
             raise Exception(colored('At least one of the variables is missing required positional argument, please check again.','red'))
         
-    os.chdir('ModelFolder')
+    if on_path:
+        os.chdir('ModelFolder')
 
     print("Check for module imported as a python package: " + colored("PASSED!", "green"))
 
 
     '''    Check the existence of model-independent files    '''
     
-    ModelFiles = os.listdir('.')
+    ModelFiles = ArchiveFiles if in_memory else os.listdir(os.path.join(model_path, 'ModelFolder'))
     Neccessary_MI_Files = ['__init__.py', 'object_library.py', 'function_library.py', 'write_param_card.py']
     Missing_MI_Files = [i for i in Neccessary_MI_Files if i not in ModelFiles]
     if Missing_MI_Files != []:
@@ -229,8 +753,7 @@ def validator(model_path):
     try:
         import parameters
     except ImportError:
-        os.chdir(model_path)
-        shutil.rmtree('ModelFolder')
+        clear_model_folder(model_path)
         raise Exception(colored('The file "parameters.py" could not be imported. Please check again', 'red'))
     
  
@@ -254,8 +777,7 @@ def validator(model_path):
     try:
         import particles
     except ImportError:
-        os.chdir(model_path)
-        shutil.rmtree('ModelFolder')
+        clear_model_folder(model_path)
         raise Exception(colored('The file "particles.py" could not be imported. Please check again', 'red'))
 
     particle_dict = {}
@@ -270,13 +792,14 @@ def validator(model_path):
                 particle_dict[item.name] = item.pdg_code
                 pdg_code_list.append(item.pdg_code)
 
-                if PDGID(item.pdg_code).is_valid == True:
-                    if PDGID(item.pdg_code).three_charge != int(round(item.charge*3)):
+                pdg = pdg_properties(item.pdg_code)
+                if pdg['is_valid'] == True:
+                    if pdg['three_charge'] != int(round(item.charge*3)):
                         Particle_with_PDG_like_ID_dict[item.name] = {'id': item.pdg_code,
                                                                      'spin': item.spin,
                                                                      'charge': item.charge}
-                    if PDGID(item.pdg_code).j_spin != item.spin:
-                        if item.spin == 1 and PDGID(item.pdg_code).j_spin == None:
+                    if pdg['j_spin'] != item.spin:
+                        if item.spin == 1 and pdg['j_spin'] == None:
                             pass
                         else:
                             Particle_with_PDG_like_ID_dict[item.name] = {'id': item.pdg_code,
@@ -285,7 +808,7 @@ def validator(model_path):
 
                     #if PDGID(item.pdg_code).is_quark or PDGID(item.pdg_code).is_lepton or PDGID(item.pdg_code).is_gauge_boson_or_higgs:
                     if item.spin in [1,2,3]:   
-                        if PDGID(item.pdg_code).is_sm_quark or PDGID(item.pdg_code).is_sm_lepton or PDGID(item.pdg_code).is_sm_gauge_boson_or_higgs:
+                        if pdg['is_sm']:
                             SM_elementary_particle_dict[item.name] = item.pdg_code
                         elif item.name not in Particle_with_PDG_like_ID_dict.keys():
                             BSM_elementary_particle_with_registered_PDGID_dict[item.name] = item.pdg_code
@@ -295,13 +818,11 @@ def validator(model_path):
                                                                  'charge': item.charge}                    
 
     if len(particle_dict) == 0:
-        os.chdir(model_path)
-        shutil.rmtree('ModelFolder')
+        clear_model_folder(model_path)
         raise Exception(colored('There should be real particles defined in "particles.py"', 'red'))
 
     if len(set(pdg_code_list)) != len(pdg_code_list):
-        os.chdir(model_path)
-        shutil.rmtree('ModelFolder')
+        clear_model_folder(model_path)
         raise Exception(colored('Some of your particles have same pdg code, please check again!', 'red'))
 
     print('Check if model contains well behaved "particles.py": ' + colored("PASSED!", 'green'))
@@ -326,8 +847,7 @@ def validator(model_path):
     try:
         import vertices
     except ImportError:
-        os.chdir(model_path)
-        shutil.rmtree('ModelFolder')
+        clear_model_folder(model_path)
         raise Exception(colored('The file "vertices.py" could not be imported. Please check again', 'red'))
 
     vertex = []
@@ -339,8 +859,7 @@ def validator(model_path):
             number_of_vertices += 1
 
     if len(vertex) == 0:
-        os.chdir(model_path)
-        shutil.rmtree('ModelFolder')
+        clear_model_folder(model_path)
         raise Exception(colored('There should be vertices defined in "vertices.py"', 'red'))
     else:
         print('Check if model contains well behaved "vertices.py": ' + colored("PASSED!", 'green'))
@@ -352,8 +871,7 @@ def validator(model_path):
     try:
         import coupling_orders
     except ImportError:
-        os.chdir(model_path)
-        shutil.rmtree('ModelFolder')
+        clear_model_folder(model_path)
         raise Exception(colored('The file "coupling_orders.py" could not be imported. Please check again', 'red'))
 
     coupling_order = []
@@ -365,8 +883,7 @@ def validator(model_path):
             number_of_coupling_orders += 1
 
     if len(coupling_order) == 0:
-        os.chdir(model_path)
-        shutil.rmtree('ModelFolder')
+        clear_model_folder(model_path)
         raise Exception(colored('There should be coupling orders defined in "coupling_orders.py"','red'))
     else:
         print('Check if model contains well behaved "coupling_orders.py": ' + colored("PASSED!", 'green'))
@@ -379,8 +896,7 @@ def validator(model_path):
     try:
         import couplings
     except ImportError:
-        os.chdir(model_path)
-        shutil.rmtree('ModelFolder')
+        clear_model_folder(model_path)
         raise Exception(colored('The file "couplings.py" could not be imported. Please check again', 'red'))
 
     coupling_tensor = []
@@ -392,8 +908,7 @@ def validator(model_path):
             number_of_coupling_tensors += 1
 
     if len(coupling_tensor) == 0:
-        os.chdir(model_path)
-        shutil.rmtree('ModelFolder')
+        clear_model_folder(model_path)
         raise Exception('There should be coupling tensors defined in "couplings.py"')
     else:
         print('Check if model contains well behaved "couplings.py": ' + colored("PASSED!", 'green'))
@@ -406,8 +921,7 @@ def validator(model_path):
     try:
         import lorentz
     except ImportError:
-        os.chdir(model_path)
-        shutil.rmtree('ModelFolder')
+        clear_model_folder(model_path)
         raise Exception(colored('The file "lorentz.py" could not be imported. Please check again', 'red'))
 
     lorentz_tensor = []
@@ -419,8 +933,7 @@ def validator(model_path):
             number_of_lorentz_tensors += 1
 
     if len(lorentz_tensor) == 0:
-        os.chdir(model_path)
-        shutil.rmtree('ModelFolder')
+        clear_model_folder(model_path)
         raise Exception(colored('There should be lorentz tensors defined in "lorentz.py"', 'red'))
     else:
         print('Check if model contains well behaved "lorentz.py": ' + colored("PASSED!", 'green'))
@@ -441,8 +954,7 @@ def validator(model_path):
                 number_of_propagators += 1
 
         if len(props) == 0:
-            os.chdir(model_path)
-            shutil.rmtree('ModelFolder')
+            clear_model_folder(model_path)
             raise Exception('There should be propagators defined in "propagators.py"')
         else:
             print('Check if model contains well behaved "propagators.py": ' + colored("PASSED!", 'green'))
@@ -464,8 +976,7 @@ def validator(model_path):
                 number_of_decays += 1
 
         if len(decay) == 0:
-            os.chdir(model_path)
-            shutil.rmtree('ModelFolder')
+            clear_model_folder(model_path)
             raise Exception('There should be decays defined in "decays.py"')
         else:
             print('Check if model contains well behaved "decays.py": ' + colored("PASSED!", 'green'))
@@ -536,10 +1047,10 @@ def validator(model_path):
         NLO_value = False
     
     # Finish the validation checking
-    os.chdir(model_path)
-    shutil.rmtree('ModelFolder')
-    sys.path.remove(model_path)
-    sys.path.remove(modelloc)
+    clear_model_folder(model_path)
+    if on_path:
+        sys.path.remove(model_path)
+        sys.path.remove(modelloc)
     for f in [f for f in sys.modules.keys() if 'ModelFolder' in f]:
         del sys.modules[f]
     for f in ['particles', 'parameters', 'vertices', 'coupling_orders', 'couplings', 'lorentz', 'propagators', 'decays']:
@@ -549,21 +1060,164 @@ def validator(model_path):
     return file, original_file, number_of_params, particle_dict, SM_elementary_particle_dict, Particle_with_PDG_like_ID_dict, BSM_elementary_particle_with_registered_PDGID_dict, number_of_vertices, number_of_coupling_orders, number_of_coupling_tensors, number_of_lorentz_tensors, number_of_propagators, number_of_decays, NLO_value
 
 
-def validator_all(all_models):
-    base_path = os.getcwd()
+def validation_worker(model_path, log_path, conn, in_memory=None, static=None, settings=None):
+    # Validate one model in its own process, so its cwd, sys.path and imported model modules
+    # never meet those of another model. The output goes to log_path, the result to conn.
+    # settings are module settings of the parent for a process that did not inherit them.
+    globals().update(settings or {})
+    sys.stdout = sys.stderr = open(log_path, 'w')
+    try:
+        os.chdir(model_path)
+        conn.send({'status': 'PASSED', 'result': validator(model_path = os.getcwd(), in_memory = in_memory, static = static), 'error': ''})
+    except BaseException as e:
+        shutil.rmtree(os.path.join(model_path, 'ModelFolder'), ignore_errors=True)
+        conn.send({'status': 'FAILED', 'result': None, 'error': str(e) or e.__class__.__name__})
+    finally:
+        sys.stdout.flush()
+        conn.close()
+
+
+def validate_models(all_models, workers=None, timeout=None, in_memory=None, static=None):
+    # Validate the models in up to workers processes at once, stopping any model that runs
+    # longer than timeout seconds. Returns one result dict per model in input order.
+    workers = validation_workers if workers is None else workers
+    timeout = validation_timeout if timeout is None else timeout
+
+    # Check the links of all models at once, the validations then find them in link_cache
+    urls = []
     for _path in all_models:
-        os.chdir(_path)
-        _ = validator(model_path = os.getcwd())
-        os.chdir(base_path)
+        try:
+            with open(os.path.join(_path, 'metadata.json')) as f:
+                urls += metadata_links(json.load(f))
+        except (IOError, OSError, ValueError, AttributeError, TypeError):
+            pass
+    check_links(urls)
 
+    log_dir = tempfile.mkdtemp()
+    pending = list(enumerate(all_models))
+    running = {}
+    results = [None] * len(all_models)
+    try:
+        while pending or running:
+            while pending and len(running) < max(1, workers):
+                i, _path = pending.pop(0)
+                log_path = os.path.join(log_dir, '{}.log'.format(i))
+                receiver, sender = multiprocessing.Pipe(False)
+                process = multiprocessing.Process(target=validation_worker, args=(os.path.abspath(_path), log_path, sender, in_memory, static))
+                process.start()
+                sender.close()
+                running[i] = (process, receiver, time.time(), log_path)
+
+            for i, (process, receiver, start, log_path) in list(running.items()):
+                if receiver.poll():
+                    result = receiver.recv()
+                    process.join()
+                elif not process.is_alive():
+                    result = {'status': 'FAILED', 'result': None, 'error': 'Validation exited with code {}'.format(process.exitcode)}
+                elif timeout and time.time() - start > timeout:
+                    process.terminate()
+                    process.join()
+                    result = {'status': 'TIMEOUT', 'result': None, 'error': 'Validation took longer than {} s'.format(timeout)}
+                else:
+                    continue
+                if result['status'] != 'PASSED':
+                    shutil.rmtree(os.path.join(os.path.abspath(all_models[i]), 'ModelFolder'), ignore_errors=True)
+                receiver.close()
+                with open(log_path) as log:
+                    result['log'] = log.read()
+                result['path'] = all_models[i]
+                result['seconds'] = time.time() - start
+                results[i] = result
+                del running[i]
+            time.sleep(0.05)
+    finally:
+        for process, receiver, start, log_path in running.values():
+            process.terminate()
+        shutil.rmtree(log_dir, ignore_errors=True)
+    return results
+
+
+def validate_model(model_path, timeout=None, in_memory=None, static=None):
+    # Validate one model in its own process and return its result dict like validate_models does,
+    # for callers validating models from several threads. The process is started fresh rather
+    # than forked, as a fork would copy locks held by the other threads, so it is handed the
+    # settings of this module it would otherwise not see.
+    model_path = os.path.abspath(model_path)
+    in_memory = validate_in_memory if in_memory is None else in_memory
+    static = validate_static if static is None else static
+    settings = dict((name, globals()[name]) for name in worker_settings)
+    context = multiprocessing.get_context('spawn') if hasattr(multiprocessing, 'get_context') else multiprocessing
+    fd, log_path = tempfile.mkstemp(suffix='.log')
+    os.close(fd)
+    receiver, sender = context.Pipe(False)
+    process = context.Process(target=validation_worker, args=(model_path, log_path, sender, in_memory, static, settings))
+    start = time.time()
+    try:
+        process.start()
+        sender.close()
+        if receiver.poll(timeout):
+            try:
+                result = receiver.recv()
+            except EOFError:
+                process.join()
+                result = {'status': 'FAILED', 'result': None, 'error': 'Validation exited with code {}'.format(process.exitcode)}
+        else:
+            process.terminate()
+            result = {'status': 'TIMEOUT', 'result': None, 'error': 'Validation took longer than {} s'.format(timeout)}
+        process.join()
+        receiver.close()
+        if result['status'] != 'PASSED':
+            shutil.rmtree(os.path.join(model_path, 'ModelFolder'), ignore_errors=True)
+        with open(log_path) as log:
+            result['log'] = log.read()
+    finally:
+        os.remove(log_path)
+    result['path'] = model_path
+    result['seconds'] = time.time() - start
+    return result
+
+
+def validator_all(all_models, workers=None, timeout=None, in_memory=None, static=None):
+    results = validate_models(all_models, workers=workers, timeout=timeout, in_memory=in_memory, static=static)
+
+    # Output of every model in input order, then one summary table
+    for result in results:
+        print(result['log'])
+        if result['status'] != 'PASSED':
+            print(colored(result['error'], 'red'))
+
+    width = max([len('Model')] + [len(i['path']) for i in results])
+    print('\n' + 'Model'.ljust(width) + '  Status   Time (s)  Particles  Vertices  NLO')
+    print('-' * (width + 45))
+    for i in results:
+        status = i['status'].ljust(7)
+        status = colored(status, 'green') if i['status'] == 'PASSED' else colored(status, 'red')
+        if i['result']:
+            details = '{:>9}  {:>8}  {}'.format(len(i['result'][3]), i['result'][7], i['result'][13])
+        else:
+            details = ''
+        print('{}  {}  {:>8.1f}  {}'.format(i['path'].ljust(width), status, i['seconds'], details))
 
-def metadatamaker(model_path, create_file = True):
-    # Check Validation and get necessary outputs
-    file, original_file, number_of_params, particle_dict, SM_elementary_particle_dict, Particle_with_PDG_like_ID_dict, BSM_elementary_particle_with_registered_PDGID_dict, number_of_vertices, number_of_coupling_orders, number_of_coupling_tensors, number_of_lorentz_tensors, number_of_propagators, number_of_decays, NLO_value = validator(model_path)
+    failed = [i['path'] for i in results if i['status'] != 'PASSED']
+    if failed:
+        raise Exception(colored('{} of {} models failed validation: {}'.format(len(failed), len(results), ', '.join(failed)), 'red'))
+    return results
+
+
+def metadatamaker(model_path, create_file = True, result = None, answers = None):
+    # Check Validation and get necessary outputs, result is the output of validator when the model was validated already.
+    # answers holds the 'modelname' and 'version' given for the model before, which are then not asked again.
+    if result is None:
+        result = validator(model_path, static = False)
+    file, original_file, number_of_params, particle_dict, SM_elementary_particle_dict, Particle_with_PDG_like_ID_dict, BSM_elementary_particle_with_registered_PDGID_dict, number_of_vertices, number_of_coupling_orders, number_of_coupling_tensors, number_of_lorentz_tensors, number_of_propagators, number_of_decays, NLO_value = result
     filename = [i for i in original_file if i != 'metadata.json'][0]
     print('\nWorking on model: ' + colored(model_path, "magenta") + "\n")
-    modelname = raw_input('Please name your model:')
-    modelversion = raw_input('Please enter your model version:')
+    if answers is not None and 'modelname' in answers:
+        modelname = answers['modelname']
+        modelversion = answers['version']
+    else:
+        modelname = raw_input('Please name your model:')
+        modelversion = raw_input('Please enter your model version:')
     Doi = "0"
     if 'Model Homepage' in file:
         Homepage = file['Model Homepage']
@@ -625,68 +1279,300 @@ def is_parent(child, parent):
     return is_parent(child.parents[0], parent)
 
         
-def uploader(model_path, myrepo, myfork, params):
-    
-    '''    Generate the metadata for the model   '''
-    file, filename, modelname, metadata_name = metadatamaker(model_path, create_file=False)
+class UploadStream(object):
+    # File-like view of a file through a read-only memory map, for requests to send in pieces.
+    # progress(sent, total) is called as the bytes are read.
+    def __init__(self, path, progress=None):
+        self.fp = open(path, 'rb')
+        self.size = os.fstat(self.fp.fileno()).st_size
+        self.map = mmap.mmap(self.fp.fileno(), 0, access=mmap.ACCESS_READ) if self.size else None
+        self.position = 0
+        self.progress = progress
+
+    def __len__(self):
+        return self.size
+
+    def tell(self):
+        return self.position
+
+    def seek(self, offset, whence=0):
+        self.position = [offset, self.position + offset, self.size + offset][whence]
+        return self.position
+
+    def read(self, n=-1):
+        end = self.size if n is None or n < 0 else min(self.size, self.position + n)
+        chunk = self.map[self.position:end] if self.map is not None else b''
+        self.position = max(self.position, end)
+        if self.progress is not None and chunk:
+            self.progress(self.position, self.size)
+        return chunk
+
+    def md5(self):
+        digest = hashlib.md5()
+        for i in range(0, self.size, 1 << 24):
+            digest.update(self.map[i:i + (1 << 24)])
+        return 'md5:' + digest.hexdigest()
+
+    def close(self):
+        if self.map is not None:
+            self.map.close()
+        self.fp.close()
+
+
+def upload_progress(filename):
+    # Progress callback printing the share of filename sent so far, in steps of one percent
+    shown = [-1]
+    def progress(sent, total):
+        percent = 100 * sent // total
+        if percent != shown[0]:
+            shown[0] = percent
+            sys.stdout.write('\rUploading {}: {:3d}% of {:.1f} MB'.format(filename, percent, total / 1e6))
+            if sent == total:
+                sys.stdout.write('\n')
+            sys.stdout.flush()
+    return progress
+
+
+def upload_file(bucket_url, path, params, progress=None):
+    # Put path into a Zenodo bucket and check that Zenodo stored the same size and checksum.
+    # Returns the checksum as Zenodo reports it ('md5:...').
+    filename = os.path.basename(path)
+    stream = UploadStream(path, upload_progress(filename) if progress is None else progress)
+    try:
+        checksum = stream.md5()
+        error = None
+        for attempt in range(upload_retries):
+            if error is not None:
+                print(colored('Uploading {} failed ({}), trying again'.format(filename, error), 'yellow'))
+            stream.seek(0)
+            try:
+                # Retried here as a whole, with the stored file checked each time
+                r = UFOHTTP.put("%s/%s" %(bucket_url, filename),
+                                data = stream,
+                                params = params,
+                                timeout = (UFOHTTP.request_timeout, upload_timeout),
+                                retries = 0)
+            except Exception as e:
+                error = e.__class__.__name__
+                continue
+            if r.status_code > 400:
+                error = "Status Code: {}".format(r.status_code)
+                continue
+            stored = r.json()
+            if stored.get('size') == stream.size and stored.get('checksum') == checksum:
+                return checksum
+            error = 'Zenodo stored {} bytes with checksum {}'.format(stored.get('size'), stored.get('checksum'))
+    finally:
+        stream.close()
+    print(colored("Putting content to Zenodo Failed!", "red"))
+    print(error)
+    raise Exception
+
+
+def load_upload_state():
+    # Replay the journal into {model folder: entry}. A record cut short by a crash is skipped.
+    state = {}
+    try:
+        f = open(upload_state)
+    except (IOError, OSError):
+        return state
+    with f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            model = record.pop('model')
+            if record.pop('forget', False):
+                state.pop(model, None)
+                continue
+            entry = state.setdefault(model, {})
+            entry.setdefault('files', {}).update(record.pop('files', {}))
+            entry.update(record)
+    return state
 
-    '''Check metadata file name'''
-    Allmetadata = myrepo.get_contents('Metadata')
-    Allmetadataname = [i.name for i in Allmetadata]
-    while True:
-        if metadata_name in Allmetadataname:
-            url = 'https://raw.githubusercontent.com/Neubauer-Group/UFOMetadata/main/Metadata/'
-            url += metadata_name
-            metadata = requests.get(url)
-            open(metadata_name,'wb').write(metadata.content)
-            with open(metadata_name,encoding='utf-8') as metadata:
-                file = json.load(metadata)
-            DOI = file['Model Doi']
+
+def write_journal(records, mode='a'):
+    # Append records to the journal, or replace it with them for mode 'w', and make sure they
+    # are on disk before the step they record is built upon
+    try:
+        os.makedirs(cache_path)
+    except OSError:
+        pass
+    path = upload_state if mode == 'a' else upload_state + '.tmp{}'.format(os.getpid())
+    with open(path, mode) as f:
+        # Start on a line of its own after a record cut short by a crash
+        if mode == 'a' and f.tell() > 0:
+            with open(upload_state, 'rb') as last:
+                last.seek(-1, 2)
+                if last.read(1) != b'\n':
+                    f.write('\n')
+        for record in records:
+            f.write(json.dumps(record) + '\n')
+        f.flush()
+        os.fsync(f.fileno())
+    if mode == 'w':
+        os.rename(path, upload_state)
+
+
+def remember_upload(model_path, **fields):
+    # Record a stage of the upload of model_path; files is merged into the files recorded before
+    fields['model'] = os.path.abspath(model_path)
+    with upload_state_lock:
+        write_journal([fields])
+
+
+def forget_upload(model_path):
+    with upload_state_lock:
+        write_journal([{'model': os.path.abspath(model_path), 'forget': True}])
+
+
+def compact_upload_state():
+    # Rewrite the journal with one record per model
+    with upload_state_lock:
+        state = load_upload_state()
+        write_journal([dict(entry, model=model) for model, entry in state.items()], mode='w')
+
+
+def journal_models(all_models, resume):
+    # Journal entries of the models of a batch. Without resume, models that went through all
+    # stages before start again and only unfinished drafts are reused. With resume, each model
+    # carries on after the last stage recorded for it and finished models are skipped.
+    compact_upload_state()
+    state = load_upload_state()
+    entries = {}
+    for _path in all_models:
+        model_path = os.path.abspath(_path)
+        entry = state.get(model_path)
+        if not entry:
+            continue
+        if 'published' in entry and not resume:
+            forget_upload(model_path)
+        elif resume:
+            entries[model_path] = entry
+        else:
+            print(colored('Found an interrupted upload of {}, use --resume to carry on from where it stopped.'.format(model_path), 'yellow'))
+    return entries
+
+
+def resume_upload(model_path, params):
+    # Upload state of model_path left by an interrupted run, with the current 'deposition' from
+    # Zenodo. None when there is none, or when its draft was published or deleted since.
+    entry = load_upload_state().get(os.path.abspath(model_path))
+    if not entry or 'deposition_id' not in entry:
+        return None
+    r = UFOHTTP.get('https://zenodo.org/api/deposit/depositions/%s' %(entry['deposition_id']), params=params)
+    if r.status_code >= 400 or r.json().get('submitted'):
+        forget_upload(model_path)
+        return None
+    entry['deposition'] = r.json()
+    print('Continuing the interrupted upload to the Zenodo draft: ' + colored(str(entry['deposition_id']), 'magenta'))
+    return entry
+
+
+def draft_checksums(entry):
+    # {file name: 'md5:...'} of the files the resumed draft of entry actually holds
+    if entry is None:
+        return {}
+    return dict((_file['filename'], 'md5:' + _file['checksum'].split(':')[-1]) for _file in entry['deposition'].get('files', []))
+
+
+def upload_model_file(model_path, filename, bucket_url, params, entry, progress=None):
+    # Upload the model archive unless the resumed draft already holds this exact file
+    path = model_path + '/%s' %(filename)
+    stored = draft_checksums(entry)
+    if filename in stored:
+        stream = UploadStream(path)
+        try:
+            unchanged = stream.md5() == stored[filename]
+        finally:
+            stream.close()
+        if unchanged:
+            print('{} is already uploaded to the draft.'.format(filename))
+            return
+    remember_upload(model_path, files={filename: upload_file(bucket_url, path, params, progress)})
+
+
+def metadata_snapshot(myrepo):
+    # The metadata file names of UFOMetadata, listed once for a whole batch of models:
+    # 'names' maps each name to its path in the repository, 'dois' to the model DOI as far as
+    # it was read, and 'batch' the names taken by models of this batch to their folders
+    UFOHTTP.github_pace(myrepo)
+    return {'names': metadata_names(myrepo), 'dois': {}, 'batch': {}}
+
+
+def metadata_doi(snapshot, metadata_name):
+    # DOI of the model with metadata_name in UFOMetadata, read from GitHub the first time only
+    if metadata_name not in snapshot['dois']:
+        url = raw_repo_url + snapshot['names'][metadata_name]
+        snapshot['dois'][metadata_name] = json.loads(UFOHTTP.get(url).content.decode('utf-8'))['Model Doi']
+    return snapshot['dois'][metadata_name]
+
+
+def add_metadata_name(snapshot, metadata_name, model_path, doi=None):
+    # Take metadata_name for the model at model_path, so later models of the batch cannot use it
+    snapshot['names'][metadata_name] = 'Metadata/' + metadata_name
+    snapshot['batch'][metadata_name] = model_path
+    if doi is not None:
+        snapshot['dois'][metadata_name] = doi
+
+
+def check_metadata_name(metadata_name, snapshot, model_path):
+    # Ask for another name for as long as metadata_name is taken in UFOMetadata or by another
+    # model of the batch, then take it for model_path
+    while metadata_name in snapshot['names'] and snapshot['batch'].get(metadata_name) != model_path:
+        if metadata_name in snapshot['batch']:
+            print('Your metadata file name has been used by the model in ' + colored(snapshot['batch'][metadata_name], 'red') + ' of this upload.')
+        else:
+            DOI = metadata_doi(snapshot, metadata_name)
             print('Your metadata file name has been used. Please check the model with DOI: ' + colored(DOI, 'red') + ' in Zenodo.')
-            os.remove(metadata_name)
-            continuecommand = raw_input('Do you want to continue your upload?' + \
-                                    colored(' Yes', 'green') + ' or' + colored(' No', 'red') + ':')
-            if continuecommand == 'Yes':
-                while True:
-                    metadata_name = raw_input('Please rename your metadata file:').replace(' ','_')
-                    try:
-                        assert metadata_name.endswith('.json')
-                        break
-                    except:
-                        print('Your metadata file name should end with ' + colored('.json', 'red') + '.')
-            else:
-                sys.exit()
+        continuecommand = raw_input('Do you want to continue your upload?' + \
+                                colored(' Yes', 'green') + ' or' + colored(' No', 'red') + ':')
+        if continuecommand == 'Yes':
+            while True:
+                metadata_name = raw_input('Please rename your metadata file:').replace(' ','_')
+                try:
+                    assert metadata_name.endswith('.json')
+                    break
+                except:
+                    print('Your metadata file name should end with ' + colored('.json', 'red') + '.')
         else:
-            break
+            raise Exception(colored('Upload cancelled, the metadata file name {} is already used'.format(metadata_name), 'red'))
+    add_metadata_name(snapshot, metadata_name, model_path)
+    return metadata_name
+
+
+def zenodo_upload(model_path, file, filename, modelname, metadata_name, params, progress=None):
+    # Upload the model to a Zenodo draft and write its enriched metadata to model_path.
+    # Returns the draft deposition id, its reserved DOI and whether Zenodo accepted the metadata.
 
     '''    Check if  Zenodo token works    '''    
-    # Create an empty upload
     headers = {"Content-Type": "application/json"}
-    r = requests.post("https://zenodo.org/api/deposit/depositions", 
-                      params= params,
-                      json= {},
-                      headers= headers)
-    if r.status_code > 400:
-        print(colored("Creating deposition entry with Zenodo Failed!", "red"))
-        print("Status Code: {}".format(r.status_code))
-        raise Exception
+    entry = resume_upload(model_path, params)
+    if entry is None:
+        # Create an empty upload
+        r = UFOHTTP.post("https://zenodo.org/api/deposit/depositions", 
+                          params= params,
+                          json= {},
+                          headers= headers)
+        if r.status_code > 400:
+            print(colored("Creating deposition entry with Zenodo Failed!", "red"))
+            print("Status Code: {}".format(r.status_code))
+            raise Exception
+        deposition = r.json()
+    else:
+        deposition = entry['deposition']
     
     # Work with Zenodo API
     
-    bucket_url = r.json()["links"]["bucket"]
-    Doi = r.json()["metadata"]["prereserve_doi"]["doi"]
-    deposition_id = r.json()["id"]
+    bucket_url = deposition["links"]["bucket"]
+    Doi = deposition["metadata"]["prereserve_doi"]["doi"]
+    deposition_id = deposition["id"]
+    remember_upload(model_path, deposition_id=deposition_id, bucket=bucket_url, doi=Doi)
 
     # Upload new files
-    path = model_path + '/%s' %(filename)
-    with open(path, 'rb') as fp:
-        r = requests.put("%s/%s" %(bucket_url, filename),
-                         data = fp,
-                         params = params)
-        if r.status_code > 400:
-            print(colored("Putting content to Zenodo Failed!", "red"))
-            print("Status Code: {}".format(r.status_code))
-            raise Exception
+    upload_model_file(model_path, filename, bucket_url, params, entry, progress)
+    remember_upload(model_path, uploaded=True)
 
     Author_Full_Information = [i for i in file['Author']]
     Author_Information = []
@@ -706,7 +1592,7 @@ def uploader(model_path, myrepo, myfork, params):
     }
 
     # Add required metadata to draft
-    r = requests.put('https://zenodo.org/api/deposit/depositions/%s' %(deposition_id),
+    r = UFOHTTP.put('https://zenodo.org/api/deposit/depositions/%s' %(deposition_id),
                      params=params,
                      data=json.dumps(data),
                      headers=headers)
@@ -720,24 +1606,43 @@ def uploader(model_path, myrepo, myfork, params):
     if len(file['Model Homepage']) == 0:
         file['Model Homepage'] = 'https://doi.org/' + Doi
 
-    with open(metadata_name,'w') as metadata:
+    with open(os.path.join(model_path, metadata_name),'w') as metadata:
         json.dump(file,metadata,indent=2)
-
-
-    '''    Upload to Github Repository    '''
-
-
-    # Create new metadata file in the forked repo
-    f= open(metadata_name).read()
-    GitHub_filename = 'Metadata/' + metadata_name
-    myfork.create_file(GitHub_filename, 'Upload metadata for model: {}'.format(metadata_name.replace('.json', '')), f, branch='main')
-
-    if r.status_code == 200:
+    remember_upload(model_path, metadata_set=True, metadata_file=metadata_name, draft_ok=r.status_code == 200)
+
+    return deposition_id, Doi, r.status_code == 200
+
+
+def github_commit(metadata_files, myfork):
+    # Add the new metadata files, [(model path, metadata file name)], to the forked repo in one
+    # commit, so the fork is updated with all of them or with none
+    files = {}
+    for model_path, metadata_name in metadata_files:
+        if 'Metadata/' + metadata_name in files:
+            raise Exception(colored('Two models of the batch have the metadata file name {}'.format(metadata_name), 'red'))
+        files['Metadata/' + metadata_name] = open(os.path.join(model_path, metadata_name)).read()
+    names = [metadata_name.replace('.json', '') for model_path, metadata_name in metadata_files]
+    if len(names) == 1:
+        message = 'Upload metadata for model: {}'.format(names[0])
+    else:
+        message = 'Upload metadata for models: {}'.format(', '.join(names))
+    # A tree, a commit and a ref update
+    UFOHTTP.github_pace(myfork, writes=3)
+    sha = commit_files(myfork, files, message, branch='main')
+    for model_path, metadata_name in metadata_files:
+        remember_upload(model_path, commit=sha)
+    print('Committed {} metadata file(s) to your fork of UFOMetadata: {}'.format(len(files), colored(sha[:7], 'magenta')))
+    return sha
+
+
+def publish_upload(deposition_id, Doi, draft_ok, params):
+    # Ask whether to publish the draft and publish it. Returns True once it is published.
+    if draft_ok:
         print('Now you can go to Zenodo to see your draft at Doi: %s, make some changes, and be ready to publish your model.'%colored(Doi, 'magenta'))
         publish_command = raw_input('Do you want to publish your model and send your new enriched metadata file to GitHub repository UFOMetadata? ' + \
                                     colored(' Yes', 'green') + ' or' + colored(' No', 'red') + ':')
         if publish_command == 'Yes':
-            r = requests.post('https://zenodo.org/api/deposit/depositions/%s/actions/publish' %(deposition_id),
+            r = UFOHTTP.post('https://zenodo.org/api/deposit/depositions/%s/actions/publish' %(deposition_id),
                               params=params)
             if r.status_code != 202:
                 print(colored("Publishing model with Zenodo Failed!", "red"))
@@ -746,18 +1651,85 @@ def uploader(model_path, myrepo, myfork, params):
             print('Your model has been successfully uploaded to Zenodo with DOI: %s' %(Doi))
             print('You can access your model in Zenodo at: {}'.format(r.json()['links']['record_html']))
             print('\n\n')
+            return True
         else:
             print("You can publish your model by yourself. Then, please send your enriched metadata file to %s. I will help upload your metadata to GitHub Repository."%colored("thanoswang@163.com/zijun4@illinois.edu", "blue"))
     else:
         print("Your Zenodo upload Draft may have some problems. You can check your Draft on Zenodo and publish it by yourself. Then, please send your enriched metadata file to %s. I will help upload your metadata to GitHub Repository."%colored("thanoswang@163.com/zijun4@illinois.edu", "blue"))
+    return False
+
+
+def uploader(model_path, myrepo, myfork, params, snapshot=None):
+    
+    '''    Generate the metadata for the model   '''
+    file, filename, modelname, metadata_name = metadatamaker(model_path, create_file=False)
+
+    '''Check metadata file name'''
+    if snapshot is None:
+        snapshot = metadata_snapshot(myrepo)
+    metadata_name = check_metadata_name(metadata_name, snapshot, model_path)
+    remember_upload(model_path, modelname=modelname, version=file['Model Version'], metadata_name=metadata_name)
+
+    '''    Upload to Zenodo    '''
+    deposition_id, Doi, draft_ok = zenodo_upload(model_path, file, filename, modelname, metadata_name, params)
+    add_metadata_name(snapshot, metadata_name, model_path, Doi)
+
+    '''    Upload to Github Repository    '''
+    github_commit([(model_path, metadata_name)], myfork)
+
+    remember_upload(model_path, published=publish_upload(deposition_id, Doi, draft_ok, params))
+
 
+def open_pull_request(g, repo, title, resume=False):
+    # Pull Request from forked branch to original. A resumed run may find the one it opened
+    # before it was interrupted, which then takes the new commits as well.
+    username = g.get_user().login
+    body = 'Upload metadata for new model(s)'
+    UFOHTTP.github_pace(repo, writes=1)
+    try:
+        return repo.create_pull(title=title, body=body, head='{}:{}'.format(username,'main'), base='{}'.format('main'))
+    except Exception as e:
+        if not resume:
+            raise
+        print(colored('No new pull request was opened, one may be open already: {}'.format(e), 'yellow'))
+
+
+def pipeline_stage(inbox, outbox, work, failures, stage):
+    # Worker of one uploader_all stage: run work on each model taken from inbox and pass it on
+    # to outbox, or add it to failures. Stops at None.
+    while True:
+        item = inbox.get()
+        if item is None:
+            return
+        try:
+            work(item)
+        except Exception as e:
+            failures.append({'path': item['path'], 'stage': stage, 'error': str(e) or e.__class__.__name__})
+            continue
+        outbox.put(item)
+
+
+def start_stage(inbox, outbox, work, failures, stage, workers):
+    threads = [threading.Thread(target=pipeline_stage, args=(inbox, outbox, work, failures, stage)) for i in range(max(1, workers))]
+    for thread in threads:
+        thread.daemon = True
+        thread.start()
+    return threads
+
+
+def stop_stage(inbox, threads):
+    for thread in threads:
+        inbox.put(None)
+    for thread in threads:
+        thread.join()
 
-def uploader_all(all_models):
+
+def uploader_all(all_models, workers=None, timeout=None, in_memory=None, resume=False):
     
     '''    Check if  Zenodo token works    '''
     Zenodo_Access_Token = getpass('Please enter your Zenodo access token:')
     params = {'access_token': Zenodo_Access_Token}
-    r = requests.get("https://zenodo.org/api/deposit/depositions", params=params)
+    r = UFOHTTP.get("https://zenodo.org/api/deposit/depositions", params=params)
     if r.status_code > 400:
         raise Exception(colored("URL connection with Zenodo Failed!", "red") + " Status Code: " + colored("{}".format(r.status_code), "red"))
     print("Validating Zenodo access token: " + colored("PASSED!", "green"))
@@ -769,7 +1741,7 @@ def uploader_all(all_models):
         g = Github(Github_Access_Token)
         github_user = g.get_user()
         # Get the public repo
-        repo = g.get_repo('Neubauer-Group/UFOMetadata')
+        repo = g.get_repo(metadata_repo)
     except:
         raise Exception(colored("Github access token cannot be validated", "red"))
 
@@ -786,26 +1758,188 @@ def uploader_all(all_models):
         print(colored("Please retry after syncing your local fork with upstream", "yellow"))
         raise Exception
 
-    # Now put all models in zenodo and put their metadata in the local fork of metadata repo
-    base_path = os.getcwd()
-    for _path in all_models:
-        print("\nChecking Model: " + colored(_path, "magenta") + "\n")
-        os.chdir(_path)
-        uploader(model_path = os.getcwd(), myrepo= repo, myfork = myfork, params = params)
-        os.chdir(base_path)
+    '''    Run the upload pipeline    '''
+    # Validation runs in the background while the models validated so far are named here, one
+    # at a time as that needs the user, and the named ones are uploaded meanwhile
+    workers = validation_workers if workers is None else workers
+    snapshot = metadata_snapshot(repo)
+    models = [{'path': os.path.abspath(_path)} for _path in all_models]
+    failures = []
+
+    # Models of an interrupted run that have their metadata set on Zenodo skip the pipeline
+    journal = journal_models(all_models, resume)
+    pending = []
+    resumed = []
+    for item in models:
+        entry = journal.get(item['path'], {})
+        item['journal'] = entry
+        if 'published' in entry:
+            print('Model {} was uploaded before, skipping it.'.format(colored(item['path'], 'magenta')))
+        elif entry.get('metadata_set'):
+            print('Model {} is on Zenodo, carrying on from there.'.format(colored(item['path'], 'magenta')))
+            item['metadata'] = (None, None, entry['modelname'], entry['metadata_file'])
+            item['upload'] = (entry['deposition_id'], entry['doi'], entry['draft_ok'])
+            add_metadata_name(snapshot, entry['metadata_file'], item['path'], entry['doi'])
+            resumed.append(item)
+        else:
+            pending.append(item)
 
-    # Pull Request from forked branch to original
-    username = g.get_user().login
-    body = 'Upload metadata for new model(s)'
-    pr = repo.create_pull(title="Upload metadata for a new model", body=body, head='{}:{}'.format(username,'main'), base='{}'.format('main'))
-    print('''
+    to_validate = queue.Queue()
+    validated = queue.Queue(pipeline_queue_size)
+    to_zenodo = queue.Queue(pipeline_queue_size)
+    uploaded = queue.Queue()
+
+    def validate(item):
+        # Uploaded metadata always comes from a regular validation, never a static one.
+        # A model that cannot be validated is passed on as failed, the loop below waits for every model.
+        try:
+            item['validation'] = validate_model(item['path'], timeout=timeout, in_memory=in_memory, static=False)
+        except Exception as e:
+            item['validation'] = {'status': 'FAILED', 'result': None, 'log': '', 'error': str(e) or e.__class__.__name__}
+
+    def upload(item):
+        item['upload'] = zenodo_upload(item['path'], *item['metadata'], params=params, progress=lambda sent, total: None)
+        add_metadata_name(snapshot, item['metadata'][3], item['path'], item['upload'][1])
+        print('Uploaded {} to the Zenodo draft with DOI: {}'.format(colored(item['path'], 'magenta'), item['upload'][1]))
+
+    for item in pending:
+        to_validate.put(item)
+    validation_threads = start_stage(to_validate, validated, validate, failures, 'validation', workers)
+    zenodo_threads = start_stage(to_zenodo, uploaded, upload, failures, 'Zenodo', upload_workers)
+
+    for i in range(len(pending)):
+        item = validated.get()
+        result = item['validation']
+        print("\nChecking Model: " + colored(item['path'], "magenta") + "\n")
+        print(result['log'])
+        if result['status'] != 'PASSED':
+            print(colored(result['error'], 'red'))
+            failures.append({'path': item['path'], 'stage': 'validation', 'error': result['error']})
+            continue
+        try:
+            file, filename, modelname, metadata_name = metadatamaker(item['path'], create_file=False, result=result['result'], answers=item['journal'])
+            metadata_name = check_metadata_name(item['journal'].get('metadata_name', metadata_name), snapshot, item['path'])
+            remember_upload(item['path'], modelname=modelname, version=file['Model Version'], metadata_name=metadata_name)
+        except Exception as e:
+            failures.append({'path': item['path'], 'stage': 'metadata', 'error': str(e) or e.__class__.__name__})
+            continue
+        item['metadata'] = (file, filename, modelname, metadata_name)
+        to_zenodo.put(item)
+
+    stop_stage(to_validate, validation_threads)
+    stop_stage(to_zenodo, zenodo_threads)
+
+    # The metadata of all models on Zenodo goes to the fork in one commit, then the drafts are
+    # published in the order of the model list
+    order = [item['path'] for item in models]
+    committed = resumed
+    while not uploaded.empty():
+        committed.append(uploaded.get())
+    committed.sort(key=lambda item: order.index(item['path']))
+    to_commit = [item for item in committed if 'commit' not in item['journal']]
+    if to_commit:
+        try:
+            github_commit([(item['path'], item['metadata'][3]) for item in to_commit], myfork)
+        except Exception as e:
+            failures.extend({'path': item['path'], 'stage': 'GitHub', 'error': str(e) or e.__class__.__name__} for item in to_commit)
+            committed = [item for item in committed if item not in to_commit]
+    for item in committed:
+        print("\nPublishing Model: " + colored(item['path'], "magenta") + "\n")
+        try:
+            remember_upload(item['path'], published=publish_upload(*item['upload'], params=params))
+        except Exception as e:
+            failures.append({'path': item['path'], 'stage': 'publishing', 'error': str(e) or e.__class__.__name__})
+
+    # Pull Request from forked branch to original, once the commit is on it
+    if committed:
+        open_pull_request(g, repo, "Upload metadata for a new model", resume)
+        print('''
     You have successfully upload your model(s) to Zenodo and created a pull request of your new enriched metadate files to GitHub repository''' + colored(' UFOMetadata', 'magenta') + '''. 
     Your pull request to UFOMetadata will be checked by GitHub's CI workflow.
     If your pull request failed or workflow doesn't start, please contact ''' +  colored('thanoswang@163.com/zijun4@illinois.edu' ,'blue')
-    )
+        )
+
+    if failures:
+        failures.sort(key=lambda i: order.index(i['path']))
+        width = max([len('Model')] + [len(i['path']) for i in failures])
+        print('\n' + 'Model'.ljust(width) + '  Stage       Error')
+        print('-' * (width + 40))
+        for i in failures:
+            print('{}  {}  {}'.format(i['path'].ljust(width), i['stage'].ljust(10), colored(i['error'], 'red')))
+        raise Exception(colored('{} of {} models were not uploaded: {}'.format(len(failures), len(models), ', '.join(i['path'] for i in failures)), 'red'))
+
+
+def record_id(url_or_doi):
+    # The Zenodo record id at the end of a record link or a Zenodo DOI
+    return url_or_doi.strip().rstrip('/').split('/')[-1].split('.')[-1]
+
+
+def load_deposition_pages(params):
+    # Pages cached for the account of the token in params, stored under a hash of the token
+    account = hashlib.sha256(params['access_token'].encode('utf-8')).hexdigest()
+    try:
+        with open(deposition_cache) as f:
+            cache = json.load(f)
+    except (IOError, OSError, ValueError):
+        cache = {}
+    return cache, account
+
+
+def save_deposition_pages(cache):
+    try:
+        os.makedirs(cache_path)
+    except OSError:
+        pass
+    tmp = deposition_cache + '.tmp{}'.format(os.getpid())
+    with open(tmp, 'w') as f:
+        json.dump(cache, f)
+    os.rename(tmp, deposition_cache)
+
+
+def deposition_index(params):
+    # All depositions of the account, every page of them, as {'concept': {concept record id:
+    # deposition}, 'latest': {latest record id: deposition}}. Each page is revalidated with the
+    # ETag it was cached with and only downloaded again when it changed.
+    cache, account = load_deposition_pages(params)
+    pages = cache.get(account, {})
+    depositions = []
+    page = 1
+    while True:
+        cached = pages.get(str(page))
+        headers = {'If-None-Match': cached['etag']} if cached and cached.get('etag') else {}
+        r = UFOHTTP.get("https://zenodo.org/api/deposit/depositions",
+                         params=dict(params, page=page, size=deposition_page_size),
+                         headers=headers)
+        if r.status_code == 304:
+            items = cached['depositions']
+        elif r.status_code > 400:
+            raise Exception(colored("Listing depositions with Zenodo Failed!", "red") + " Status Code: " + colored("{}".format(r.status_code), "red"))
+        else:
+            items = r.json()
+            pages[str(page)] = {'etag': r.headers.get('ETag'), 'depositions': items}
+        depositions += items
+        if len(items) < deposition_page_size:
+            break
+        page += 1
+    # Pages past the end are left from when the account had more depositions
+    for key in [key for key in pages if int(key) > page]:
+        del pages[key]
+    cache[account] = pages
+    save_deposition_pages(cache)
+
+    index = {'concept': {}, 'latest': {}}
+    for _entry in depositions:
+        if _entry.get('conceptrecid'):
+            index['concept'][str(_entry['conceptrecid'])] = _entry
+        elif _entry.get('conceptdoi'):
+            index['concept'][record_id(_entry['conceptdoi'])] = _entry
+        if 'latest' in _entry.get('links', {}):
+            index['latest'][record_id(_entry['links']['latest'])] = _entry
+    print('Found {} depositions in your Zenodo account.'.format(len(depositions)))
+    return index
 
 
-def newversion(model_path, myrepo, myfork, params, depositions):
+def newversion(model_path, myrepo, myfork, params, depositions, snapshot=None, answers=None):
 
     '''    Check for necessary files and their formats    '''
     original_file = os.listdir(model_path)
@@ -831,7 +1965,7 @@ def newversion(model_path, myrepo, myfork, params, depositions):
         raise Exception(colored('We suggest you to upload your model to Zenodo', 'red'))
 
     url = 'https://doi.org/' + file['Existing Model Doi']
-    existing_model_webpage = requests.get(url)
+    existing_model_webpage = UFOHTTP.get(url)
 
     try:
         assert existing_model_webpage.status_code < 400
@@ -840,85 +1974,86 @@ def newversion(model_path, myrepo, myfork, params, depositions):
 
 
     '''    Generate the metadata for the model   '''
-    file, filename, modelname, metadata_name = metadatamaker(model_path, create_file=False)
+    file, filename, modelname, metadata_name = metadatamaker(model_path, create_file=False, answers=answers)
     
     '''Check metadata file name'''
-    Allmetadata = myrepo.get_contents('Metadata')
-    Allmetadataname = [i.name for i in Allmetadata]
-    while True:
-        if metadata_name in Allmetadataname:
-            url = 'https://raw.githubusercontent.com/Neubauer-Group/UFOMetadata/main/Metadata/'
-            url += metadata_name
-            metadata = requests.get(url)
-            open(metadata_name,'wb').write(metadata.content)
-            with open(metadata_name,encoding='utf-8') as metadata:
-                file = json.load(metadata)
-            DOI = file['Model Doi']
-            print('Your metadata file name has been used. Please check the model with DOI: ' + colored(DOI, 'red') + ' in Zenodo.')
-            os.remove(metadata_name)
-            continuecommand = raw_input('Do you want to continue your upload?' + \
-                                    colored(' Yes', 'green') + ' or' + colored(' No', 'red') + ':')
-            if continuecommand == 'Yes':
-                while True:
-                    metadata_name = raw_input('Please rename your metadata file:').replace(' ','_')
-                    try:
-                        assert metadata_name.endswith('.json')
-                        break
-                    except:
-                        print('Your metadata file name should end with ' + colored('.json', 'red') + '.')
-            else:
-                sys.exit()
-        else:
-            break
+    if snapshot is None:
+        snapshot = metadata_snapshot(myrepo)
+    metadata_name = check_metadata_name((answers or {}).get('metadata_name', metadata_name), snapshot, model_path)
+    remember_upload(model_path, modelname=modelname, version=file['Model Version'], metadata_name=metadata_name)
 
     '''    Find corresponding old version from the concept DOI    '''
-    filenames = []
-    found_entry = False
-    entry = None
-    for _entry in depositions:
-        if _entry['conceptdoi'].strip().split('.')[-1] == file['Existing Model Doi'].strip().split('.')[-1]:
-            found_entry = True
-            entry = _entry
+    existing_id = record_id(file['Existing Model Doi'])
+    entry = depositions['concept'].get(existing_id, depositions['latest'].get(existing_id))
+    found_entry = entry is not None
 
     assert found_entry, colored('The zenodo entry corresponding to DOI: {} not found'.format(file['Existing Model Doi']), 'red')
 
     old_deposition_id = entry['links']['latest'].strip().split('/')[-1]
-    _r = requests.get("https://zenodo.org/api/records/{}".format(old_deposition_id), params=params)
+    _r = UFOHTTP.get("https://zenodo.org/api/records/{}".format(old_deposition_id), params=params)
+    previous = {}
     for _file in _r.json()['files']:
         link = _file['links']['self'].strip()
-        fname = link.split('/')[-1]
-        filenames.append(fname)
-
-    print('Your previous upload contains the file(s): %s. Do you want to delete them?' %(colored(','.join(filenames), 'magenta')))
-
-    deletelist = [f.strip() for f in raw_input('Please enter file names you want to delete in your new version, separated names with comma, or Enter ' + colored("No", "red") + ": ").split(',')]
+        fname = _file.get('key') or link.split('/')[-1]
+        previous[fname] = 'md5:' + _file['checksum'].split(':')[-1]
+
+    '''    Compare the model files with the previous version    '''
+    # The model folder holds the files of the new version: files of the previous version with
+    # the same name and checksum are kept as they are, the others are deleted from the draft,
+    # and only new or changed files are uploaded
+    local = {}
+    for _file in [filename]:
+        stream = UploadStream(os.path.join(model_path, _file))
+        try:
+            local[_file] = stream.md5()
+        finally:
+            stream.close()
+    unchanged = [i for i in local if previous.get(i) == local[i]]
+    removed = [i for i in previous if i not in local]
+    changed = [i for i in local if i not in unchanged]
+    if unchanged:
+        print('Unchanged since the previous version, kept: %s' %(colored(', '.join(unchanged), 'green')))
+    if removed:
+        print('Not in the new version, deleted: %s' %(colored(', '.join(removed), 'red')))
+    if changed:
+        print('New or changed, uploaded: %s' %(colored(', '.join(changed), 'magenta')))
 
 
     # Work with new version draft
     '''    Request a  new version    '''
-    r = requests.post("https://zenodo.org/api/deposit/depositions/%s/actions/newversion"%(old_deposition_id),params=params)
-    if r.status_code > 400:
-        print(colored("Creating deposition entry with Zenodo Failed!", "red"))
-        print("Status Code: {}".format(r.status_code))
-        raise Exception
-
-    # Get new deposition id
-    new_deposition_id = r.json()['links']['latest_draft'].split('/')[-1]
-    
-    if deletelist[0] != 'No':
-        r = requests.get("https://zenodo.org/api/deposit/depositions/%s/files"%(new_deposition_id), params=params)
+    entry = resume_upload(model_path, params)
+    if entry is None:
+        r = UFOHTTP.post("https://zenodo.org/api/deposit/depositions/%s/actions/newversion"%(old_deposition_id),params=params)
         if r.status_code > 400:
-            print(colored("Could not fetch file details from latest version!", "red"))
+            print(colored("Creating deposition entry with Zenodo Failed!", "red"))
             print("Status Code: {}".format(r.status_code))
             raise Exception
-        for _file in r.json():
-            if _file['filename'] in deletelist:
-                _link = _file['links']['self']
-                r = requests.delete(_link, params=params)
+
+        # Get new deposition id
+        new_deposition_id = r.json()['links']['latest_draft'].split('/')[-1]
+        remember_upload(model_path, deposition_id=new_deposition_id)
+    else:
+        new_deposition_id = str(entry['deposition_id'])
+    
+    # The draft starts with the files of the previous version. Only what differs from the model
+    # folder is deleted, which also keeps what a resumed upload already sent.
+    r = UFOHTTP.get("https://zenodo.org/api/deposit/depositions/%s/files"%(new_deposition_id), params=params)
+    if r.status_code > 400:
+        print(colored("Could not fetch file details from latest version!", "red"))
+        print("Status Code: {}".format(r.status_code))
+        raise Exception
+    for _file in r.json():
+        if local.get(_file['filename']) != 'md5:' + _file['checksum'].split(':')[-1]:
+            _link = _file['links']['self']
+            r = UFOHTTP.delete(_link, params=params)
+            if r.status_code > 400:
+                print(colored("Deleting {} from the new version Failed!".format(_file['filename']), "red"))
+                print("Status Code: {}".format(r.status_code))
+                raise Exception
 
     headers = {"Content-Type": "application/json"}
     
-    r = requests.get('https://zenodo.org/api/deposit/depositions/%s' %(new_deposition_id),
+    r = UFOHTTP.get('https://zenodo.org/api/deposit/depositions/%s' %(new_deposition_id),
                      json={},
                      params=params,
                      headers=headers )
@@ -930,17 +2065,12 @@ def newversion(model_path, myrepo, myfork, params, depositions):
 
     bucket_url = r.json()["links"]["bucket"]
     Doi = r.json()["metadata"]["prereserve_doi"]["doi"]
+    remember_upload(model_path, bucket=bucket_url, doi=Doi)
     
-    # Upload new model files
-    path = model_path + '/%s' %(filename)
-    with open(path, 'rb') as fp:
-        r = requests.put("%s/%s" %(bucket_url, filename),
-                         data = fp,
-                         params = params)
-        if r.status_code > 400:
-            print(colored("Putting content to Zenodo Failed!", "red"))
-            print("Status Code: {}".format(r.status_code))
-            raise Exception
+    # Upload new model files, those the draft already holds unchanged are skipped
+    for _file in changed:
+        upload_model_file(model_path, _file, bucket_url, params, {'deposition': r.json()})
+    remember_upload(model_path, uploaded=True)
 
     # Create Zenodo upload metadata
     Author_Full_Information = [i for i in file['Author']]
@@ -963,7 +2093,7 @@ def newversion(model_path, myrepo, myfork, params, depositions):
         }
     }
 
-    r = requests.put('https://zenodo.org/api/deposit/depositions/%s' %(new_deposition_id),
+    r = UFOHTTP.put('https://zenodo.org/api/deposit/depositions/%s' %(new_deposition_id),
                      params=params,
                      data=json.dumps(data),
                      headers=headers)
@@ -982,41 +2112,21 @@ def newversion(model_path, myrepo, myfork, params, depositions):
     '''    Create enriched metadata file    '''
     newmetadataname = metadata_name.split('.')[0] + '.V' + file['Model Version'] + '.json' 
 
-    with open(newmetadataname,'w') as metadata:
+    with open(os.path.join(model_path, newmetadataname),'w') as metadata:
         json.dump(file,metadata,indent=2)
+    add_metadata_name(snapshot, newmetadataname, model_path, Doi)
+    remember_upload(model_path, metadata_set=True, metadata_file=newmetadataname, draft_ok=r.status_code == 200)
 
-    
-    '''    Upload to Github Repository    '''
+    # Committed to GitHub and published by newversion_all, together with the other models
+    return newmetadataname, (new_deposition_id, Doi, r.status_code == 200)
 
-    f= open(newmetadataname).read()
-    GitHub_filename = 'Metadata/' + newmetadataname
-    myfork.create_file(GitHub_filename, 'Upload metadata for model: {}'.format(metadata_name.replace('.json', '')), f, branch='main')
 
-    if r.status_code == 200:
-        print('Now you can go to Zenodo to see your draft at Doi: %s, make some changes, and be ready to publish your model.'%colored(Doi, 'magenta'))
-        publish_command = raw_input('Do you want to publish your model and send your new enriched metadata file to GitHub repository UFOMetadata? ' + \
-                                    colored(' Yes', 'green') + ' or' + colored(' No', 'red') + ':')
-        if publish_command == 'Yes':
-            r = requests.post('https://zenodo.org/api/deposit/depositions/%s/actions/publish' %(new_deposition_id),
-                              params=params)
-            if r.status_code != 202:
-                print(colored("Publishing model with Zenodo Failed!", "red"))
-                print(r.json())
-                raise Exception
-            print('Your model has been successfully uploaded to Zenodo with DOI: %s' %(Doi))
-            print('You can access your model in Zenodo at: {}'.format(r.json()["links"]["record_html"]))
-            print('\n\n')
-        else:
-            print("You can publish your model by yourself. Then, please send your enriched metadata file to %s. I will help upload your metadata to GitHub Repository."%colored("thanoswang@163.com", "blue"))
-    else:
-        print("Your Zenodo upload Draft may have some problems. You can check your Draft on Zenodo and publish it by yourself. Then, please send your enriched metadata file to %s. I will help upload your metadata to GitHub Repository."%colored("thanoswang@163.com", "blue"))
-
-def newversion_all(all_models):
+def newversion_all(all_models, resume=False):
 
     '''    Check if  Zenodo token works    '''
     Zenodo_Access_Token = getpass('Please enter your Zenodo access token:')
     params = {'access_token': Zenodo_Access_Token}
-    r = requests.get("https://zenodo.org/api/deposit/depositions", params=params)
+    r = UFOHTTP.get("https://zenodo.org/api/deposit/depositions", params=params)
     if r.status_code > 400:
         raise Exception(colored("URL connection with Zenodo Failed!", "red") + " Status Code: " + colored("{}".format(r.status_code), "red"))
     print("Validating Zenodo access token: " + colored("PASSED!", "green"))
@@ -1028,7 +2138,7 @@ def newversion_all(all_models):
         g = Github(Github_Access_Token)
         github_user = g.get_user()
         # Get the public repo
-        repo = g.get_repo('Neubauer-Group/UFOMetadata')
+        repo = g.get_repo(metadata_repo)
     except:
         raise Exception(colored("Github access token cannot be validated", "red"))
 
@@ -1047,16 +2157,41 @@ def newversion_all(all_models):
 
     # Now put all models in zenodo and put their metadata in the local fork of metadata repo
     base_path = os.getcwd()
+    # The metadata names of UFOMetadata and the Zenodo depositions are listed once for all models
+    snapshot = metadata_snapshot(repo)
+    depositions = deposition_index(params)
+    journal = journal_models(all_models, resume)
+    uploads = []
     for _path in all_models:
+        model_path = os.path.abspath(_path)
+        entry = journal.get(model_path, {})
+        # Models of an interrupted run carry on after the last stage recorded for them
+        if 'published' in entry:
+            print('Model {} was uploaded before, skipping it.'.format(colored(model_path, 'magenta')))
+            continue
+        if entry.get('metadata_set'):
+            print('Model {} is on Zenodo, carrying on from there.'.format(colored(model_path, 'magenta')))
+            add_metadata_name(snapshot, entry['metadata_file'], model_path, entry['doi'])
+            uploads.append((model_path, entry['metadata_file'], (entry['deposition_id'], entry['doi'], entry['draft_ok']), 'commit' in entry))
+            continue
         print("\nChecking Model: " + colored(_path, "magenta") + "\n")
         os.chdir(_path)
-        newversion(model_path = os.getcwd(), myrepo= repo, myfork = myfork, params = params, depositions = r.json())
+        newmetadataname, upload = newversion(model_path = os.getcwd(), myrepo= repo, myfork = myfork, params = params, depositions = depositions, snapshot = snapshot, answers = entry)
+        uploads.append((os.getcwd(), newmetadataname, upload, False))
         os.chdir(base_path)
 
-    # Pull Request from forked branch to original
-    username = g.get_user().login
-    body = 'Upload metadata for new model(s)'
-    pr = repo.create_pull(title="Upload metadata for a model's new version", body=body, head='{}:{}'.format(username,'main'), base='{}'.format('main'))
+    '''    Upload to Github Repository    '''
+    to_commit = [(model_path, newmetadataname) for model_path, newmetadataname, upload, committed in uploads if not committed]
+    if to_commit:
+        github_commit(to_commit, myfork)
+    for model_path, newmetadataname, upload, committed in uploads:
+        print("\nPublishing Model: " + colored(model_path, "magenta") + "\n")
+        remember_upload(model_path, published=publish_upload(*upload, params=params))
+
+    # Pull Request from forked branch to original, once the commit is on it
+    if not uploads:
+        return
+    open_pull_request(g, repo, "Upload metadata for a model's new version", resume)
     print('''
     You have successfully uploaded your model(s) to Zenodo and created a pull request of your new enriched metadate files to GitHub repository''' + colored(' UFOMetadata', 'magenta') + '''. 
     Your pull request to UFOMetadata will be checked by GitHub's CI workflow.
@@ -1065,7 +2200,7 @@ def newversion_all(all_models):
 
 
 
-def githubupload(model_path, myrepo, myfork):
+def githubupload(model_path, myrepo, myfork, snapshot=None):
     '''    Check for necessary files and their formats    '''
     original_file = os.listdir(model_path)
 
@@ -1091,7 +2226,7 @@ def githubupload(model_path, myrepo, myfork):
 
 
     url = 'https://doi.org/' + file['Model Doi']
-    existing_model_webpage = requests.get(url)
+    existing_model_webpage = UFOHTTP.get(url)
     try:
         assert existing_model_webpage.status_code < 400
     except:
@@ -1105,45 +2240,17 @@ def githubupload(model_path, myrepo, myfork):
     if len(file['Model Homepage']) == 0:
         file['Model Homepage'] = 'https://doi.org/' + file['Model Doi']
 
-    with open(metadata_name,'w') as metadata:
-        json.dump(file,metadata,indent=2)
-
     '''Check metadata file name'''
-    Allmetadata = myrepo.get_contents('Metadata')
-    Allmetadataname = [i.name for i in Allmetadata]
-    while True:
-        if metadata_name in Allmetadataname:
-            url = 'https://raw.githubusercontent.com/Neubauer-Group/UFOMetadata/main/Metadata/'
-            url += metadata_name
-            metadata = requests.get(url)
-            open(metadata_name,'wb').write(metadata.content)
-            with open(metadata_name,encoding='utf-8') as metadata:
-                file = json.load(metadata)
-            DOI = file['Model Doi']
-            print('Your metadata file name has been used. Please check the model with DOI: ' + colored(DOI, 'red') + ' in Zenodo.')
-            os.remove(metadata_name)
-            continuecommand = raw_input('Do you want to continue your upload?' + \
-                                    colored(' Yes', 'green') + ' or' + colored(' No', 'red') + ':')
-            if continuecommand == 'Yes':
-                while True:
-                    metadata_name = raw_input('Please rename your metadata file:').replace(' ','_')
-                    try:
-                        assert metadata_name.endswith('.json')
-                        break
-                    except:
-                        print('Your metadata file name should end with ' + colored('.json', 'red') + '.')
-            else:
-                sys.exit()
-        else:
-            break
-
-    '''    Upload to Github Repository    '''
+    if snapshot is None:
+        snapshot = metadata_snapshot(myrepo)
+    metadata_name = check_metadata_name(metadata_name, snapshot, model_path)
+    add_metadata_name(snapshot, metadata_name, model_path, file['Model Doi'])
 
+    with open(os.path.join(model_path, metadata_name),'w') as metadata:
+        json.dump(file,metadata,indent=2)
 
-    # Create new metadata file in the forked repo
-    f= open(metadata_name).read()
-    GitHub_filename = 'Metadata/' + metadata_name
-    myfork.create_file(GitHub_filename, 'Upload metadata for model: {}'.format(metadata_name.replace('.json', '')), f, branch='main')
+    # Committed to GitHub by githubupload_all, together with the other models
+    return metadata_name
 
 
 def githubupload_all(all_models):
@@ -1154,7 +2261,7 @@ def githubupload_all(all_models):
         g = Github(Github_Access_Token)
         github_user = g.get_user()
         # Get the public repo
-        repo = g.get_repo('Neubauer-Group/UFOMetadata')
+        repo = g.get_repo(metadata_repo)
     except:
         raise Exception(colored("Github access token cannot be validated", "red"))
 
@@ -1173,15 +2280,22 @@ def githubupload_all(all_models):
 
     # Now put all models in zenodo and put their metadata in the local fork of metadata repo
     base_path = os.getcwd()
+    # The metadata names of UFOMetadata are listed once for all models
+    snapshot = metadata_snapshot(repo)
+    metadata_files = []
     for _path in all_models:
         print("\nChecking Model: " + colored(_path, "magenta") + "\n")
         os.chdir(_path)
-        githubupload(model_path = os.getcwd(), myrepo= repo, myfork = myfork)
+        metadata_files.append((os.getcwd(), githubupload(model_path = os.getcwd(), myrepo= repo, myfork = myfork, snapshot = snapshot)))
         os.chdir(base_path)
 
-    # Pull Request from forked branch to original
+    '''    Upload to Github Repository    '''
+    github_commit(metadata_files, myfork)
+
+    # Pull Request from forked branch to original, once the commit is on it
     username = g.get_user().login
     body = 'Upload metadata for new model(s)'
+    UFOHTTP.github_pace(repo, writes=1)
     pr = repo.create_pull(title="Upload metadata for a new model", body=body, head='{}:{}'.format(username,'main'), base='{}'.format('main'))
     print('''
     You have successfully upload your model(s) to Zenodo and created a pull request of your new enriched metadate files to GitHub repository''' + colored(' UFOMetadata', 'magenta') + '''. 
@@ -1214,10 +2328,31 @@ if __name__ == '__main__':
 
     parser = argparse.ArgumentParser()
     parser.add_argument('command', choices=FUNCTION_MAP.keys())
+    parser.add_argument('--workers', type=int, default=None,
+                        help='number of models validated at the same time by "Validation check" and "Upload model"')
+    parser.add_argument('--timeout', type=float, default=None,
+                        help='seconds after which "Validation check" and "Upload model" stop validating a model')
+    parser.add_argument('--in-memory', action='store_true', default=None,
+                        help='import models straight from their archives instead of extracting them')
+    parser.add_argument('--static', action='store_true', default=None,
+                        help='parse the model files instead of importing them, without running any model code')
+    parser.add_argument('--resume', action='store_true',
+                        help='carry on with an interrupted "Upload model" or "Update new version" from the last stage each model reached')
     args = parser.parse_args()
     RunFunction = FUNCTION_MAP[args.command]
+    if args.static and args.command != 'Validation check':
+        parser.error('--static only applies to "Validation check", uploaded metadata needs a regular validation')
+    if args.resume and args.command not in ['Upload model', 'Update new version']:
+        parser.error('--resume only applies to "Upload model" and "Update new version"')
 
     TXT = raw_input('Please enter the path to a text file with the list of all UFO models:')
     with open(TXT) as f:
         all_models = [line.strip() for line in f.readlines() if not line.strip().startswith('#')]
-    RunFunction(all_models = all_models)
+    if args.command == 'Validation check':
+        RunFunction(all_models = all_models, workers = args.workers, timeout = args.timeout, in_memory = args.in_memory, static = args.static)
+    elif args.command == 'Upload model':
+        RunFunction(all_models = all_models, workers = args.workers, timeout = args.timeout, in_memory = args.in_memory, resume = args.resume)
+    elif args.command == 'Update new version':
+        RunFunction(all_models = all_models, resume = args.resume)
+    else:
+        RunFunction(all_models = all_models)
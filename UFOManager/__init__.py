@@ -18,5 +18,15 @@ __all__=[
     'Downloader',
     'Search_Download',
     'Delete',
-    'Download'
+    'Clear_Cache',
+    'Download',
+    'metadata_tree',
+    'metadata_names',
+    'Query',
+    'Query_Records',
+    'Query_Stream',
+    'pdg_properties',
+    'is_sm_elementary',
+    'open_catalog',
+    'update_catalog'
 ]
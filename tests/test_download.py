@@ -0,0 +1,93 @@
+# Streaming downloads of UFODownload against a local stand-in server that drops every
+# connection after a fixed number of bytes, the way a flaky link to Zenodo does.
+import hashlib
+import os
+import socket
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from UFOManager import UFODownload
+
+data = os.urandom(5000000)
+# Bytes sent per request before the connection is cut
+drop_after = 1500000
+
+
+class DroppingHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        start = 0
+        if self.headers.get('Range'):
+            start = int(self.headers['Range'].split('=')[1].rstrip('-'))
+        self.server.ranges.append(start)
+        body = data[start:]
+        self.send_response(206 if start else 200)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body[:drop_after])
+        self.wfile.flush()
+        if len(body) > drop_after:
+            self.connection.shutdown(socket.SHUT_RDWR)
+            self.close_connection = True
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server(monkeypatch):
+    monkeypatch.setattr(UFODownload, 'retry_pause', 0)
+    srv = ThreadingHTTPServer(('127.0.0.1', 0), DroppingHandler)
+    srv.ranges = []
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    yield srv
+    srv.shutdown()
+    srv.server_close()
+
+
+def file_url(server):
+    return 'http://127.0.0.1:{}/files/big.zip'.format(server.server_address[1])
+
+
+def test_dropped_connections_resume(server, tmp_path):
+    path = str(tmp_path / 'big.zip')
+    transferred = UFODownload.download_file(file_url(server), path, len(data), 'md5:' + hashlib.md5(data).hexdigest())
+
+    assert transferred == len(data)
+    with open(path, 'rb') as f:
+        assert f.read() == data
+    # Every retry continues after what was kept, never from the start
+    assert server.ranges[0] == 0 and len(server.ranges) > 1
+    assert server.ranges == sorted(set(server.ranges))
+    assert not os.path.exists(path + '.part')
+
+
+def test_partial_file_of_earlier_run_is_continued(server, tmp_path):
+    path = str(tmp_path / 'big.zip')
+    with open(path + '.part', 'wb') as f:
+        f.write(data[:4000000])
+    transferred = UFODownload.download_file(file_url(server), path, len(data), 'md5:' + hashlib.md5(data).hexdigest())
+
+    assert transferred == len(data) - 4000000
+    assert server.ranges == [4000000]
+    with open(path, 'rb') as f:
+        assert f.read() == data
+
+
+def test_wrong_checksum_deletes_the_file(server, tmp_path):
+    path = str(tmp_path / 'big.zip')
+    with pytest.raises(Exception, match='Checksum'):
+        UFODownload.download_file(file_url(server), path, len(data), 'md5:' + hashlib.md5(b'other').hexdigest())
+    assert not os.path.exists(path)
+    assert not os.path.exists(path + '.part')
+
+
+def test_too_many_drops_keep_the_partial_file(server, tmp_path, monkeypatch):
+    monkeypatch.setattr(UFODownload, 'download_retries', 1)
+    path = str(tmp_path / 'big.zip')
+    with pytest.raises(Exception, match='Too many interrupted transfers'):
+        UFODownload.download_file(file_url(server), path, len(data), 'md5:' + hashlib.md5(data).hexdigest())
+    assert 0 < os.path.getsize(path + '.part') < len(data)
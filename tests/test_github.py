@@ -0,0 +1,119 @@
+# Listing of UFOMetadata through the git trees API, against a local stand-in of the GitHub API
+# serving a Metadata folder of 10000 files. Like GitHub, it truncates recursive trees that hold
+# more than a fixed number of entries.
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+import pytest
+from github import Github
+
+from UFOManager.UFOGitHub import metadata_tree, metadata_names
+
+# Entries a recursive tree answer holds before it is truncated
+truncate_after = 7000
+
+
+def build_trees(folders, per_folder):
+    # {tree sha: [entries]} of a repository with README.md and Metadata/<folder>/<n>.json
+    trees = {}
+    metadata = []
+    for folder in range(folders):
+        sha = 'tree-{}'.format(folder)
+        trees[sha] = [{'path': '{}-{}.json'.format(folder, n), 'mode': '100644', 'type': 'blob',
+                       'sha': 'blob-{}-{}'.format(folder, n)} for n in range(per_folder)]
+        metadata.append({'path': 'folder{}'.format(folder), 'mode': '040000', 'type': 'tree', 'sha': sha})
+    metadata.append({'path': 'notes.txt', 'mode': '100644', 'type': 'blob', 'sha': 'blob-notes'})
+    trees['tree-metadata'] = metadata
+    trees['main'] = [{'path': 'README.md', 'mode': '100644', 'type': 'blob', 'sha': 'blob-readme'},
+                     {'path': 'Metadata', 'mode': '040000', 'type': 'tree', 'sha': 'tree-metadata'}]
+    return trees
+
+
+def recursive_entries(trees, sha, prefix=''):
+    entries = []
+    for entry in trees[sha]:
+        entries.append(dict(entry, path=prefix + entry['path']))
+        if entry['type'] == 'tree':
+            entries += recursive_entries(trees, entry['sha'], prefix + entry['path'] + '/')
+    return entries
+
+
+class TreesHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if '/git/trees/' not in url.path:
+            # The repository itself
+            body = json.dumps({'full_name': 'Neubauer-Group/UFOMetadata', 'name': 'UFOMetadata',
+                               'url': 'http://{}:{}{}'.format(*(self.server.server_address + (url.path,)))}).encode()
+        else:
+            sha = url.path.split('/git/trees/')[-1]
+            recursive = 'recursive' in parse_qs(url.query)
+            self.server.calls.append((sha, recursive))
+            entries = recursive_entries(self.server.trees, sha) if recursive else self.server.trees[sha]
+            body = json.dumps({'sha': sha, 'url': self.path, 'tree': entries[:truncate_after],
+                               'truncated': len(entries) > truncate_after}).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def serve(trees):
+    srv = ThreadingHTTPServer(('127.0.0.1', 0), TreesHandler)
+    srv.trees = trees
+    srv.calls = []
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    g = Github(base_url='http://127.0.0.1:{}'.format(srv.server_address[1]))
+    return srv, g.get_repo('Neubauer-Group/UFOMetadata')
+
+
+@pytest.fixture
+def small():
+    srv, repo = serve(build_trees(2, 1000))
+    yield srv, repo
+    srv.shutdown()
+    srv.server_close()
+
+
+@pytest.fixture
+def large():
+    srv, repo = serve(build_trees(4, 2500))
+    yield srv, repo
+    srv.shutdown()
+    srv.server_close()
+
+
+def test_complete_tree_is_listed_in_one_call(small):
+    srv, repo = small
+    listing = metadata_tree(repo)
+
+    assert len(listing) == 2000
+    assert listing['Metadata/folder1/1-999.json'] == 'blob-1-999'
+    assert srv.calls == [('main', False), ('tree-metadata', True)]
+
+
+def test_truncated_tree_is_walked_by_directory(large):
+    srv, repo = large
+    listing = metadata_tree(repo)
+
+    assert len(listing) == 10000
+    assert listing['Metadata/folder3/3-2499.json'] == 'blob-3-2499'
+    assert 'Metadata/notes.txt' not in listing
+    assert ('tree-metadata', False) in srv.calls
+    assert all(('tree-{}'.format(i), True) in srv.calls for i in range(4))
+
+
+def test_metadata_names(large):
+    srv, repo = large
+    names = metadata_names(repo)
+
+    assert len(names) == 10000
+    assert names['2-7.json'] == 'Metadata/folder2/2-7.json'
@@ -0,0 +1,87 @@
+# Pacing of UFOHTTP against a local stand-in API that allows a fixed number of calls per
+# window and answers 429 beyond it, reporting its quota in X-RateLimit headers like Zenodo.
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from UFOManager import UFOHTTP
+
+limit = 10
+window = 1.0
+
+
+class LimitedHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        srv = self.server
+        with srv.lock:
+            now = time.time()
+            if now - srv.start >= window:
+                srv.start = now
+                srv.used = 0
+            allowed = srv.used < limit
+            if allowed:
+                srv.used += 1
+                srv.ok += 1
+            else:
+                srv.rejected += 1
+            remaining = limit - srv.used
+            reset = srv.start + window
+        self.send_response(200 if allowed else 429)
+        self.send_header('X-RateLimit-Remaining', str(remaining))
+        self.send_header('X-RateLimit-Reset', repr(reset))
+        self.send_header('Content-Length', '2')
+        self.end_headers()
+        self.wfile.write(b'ok')
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server(monkeypatch):
+    for name in ['quotas', 'buckets', 'in_flight']:
+        monkeypatch.setattr(UFOHTTP, name, {})
+    srv = ThreadingHTTPServer(('127.0.0.1', 0), LimitedHandler)
+    srv.lock = threading.Lock()
+    srv.start = time.time()
+    srv.used = srv.ok = srv.rejected = 0
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    srv.host = '127.0.0.1:{}'.format(srv.server_address[1])
+    yield srv
+    srv.shutdown()
+    srv.server_close()
+
+
+def test_quota_headers_keep_concurrent_calls_under_the_limit(server):
+    url = 'http://{}/records'.format(server.host)
+    with ThreadPoolExecutor(max_workers=6) as pool:
+        statuses = list(pool.map(lambda i: UFOHTTP.get(url, retries=0).status_code, range(30)))
+
+    assert statuses == [200] * 30
+    assert server.rejected == 0
+
+
+def test_token_bucket_spreads_calls(server, monkeypatch):
+    monkeypatch.setitem(UFOHTTP.rate_limits, server.host, (20.0, 2))
+    url = 'http://{}/records'.format(server.host)
+    start = time.time()
+    for i in range(10):
+        assert UFOHTTP.get(url, retries=0).status_code == 200
+    # 2 calls at once, then one every 1/20 s
+    assert time.time() - start >= 8 / 20.0
+
+
+def test_rejected_call_is_retried_after_the_reset(server):
+    url = 'http://{}/records'.format(server.host)
+    # Use up the quota behind the back of UFOHTTP, which has not seen any answer yet
+    server.used = limit
+    server.start = time.time()
+    r = UFOHTTP.get(url)
+
+    assert r.status_code == 200
+    assert server.rejected == 1